@@ -0,0 +1,19 @@
+#version 330 core
+layout(location = 0) in vec3 aPos;
+layout(location = 1) in vec2 aTexCoord;
+// per instance: center and spin angle (updated every frame), scale along each axis (fixed)
+layout(location = 2) in vec4 aCenterSpin;
+layout(location = 3) in vec3 aScale;
+out vec2 TexCoord;
+
+uniform mat4 projection;
+uniform mat4 view;
+
+void main() {
+    vec3 p = aPos * aScale;
+    float c = cos(aCenterSpin.w);
+    float s = sin(aCenterSpin.w);
+    p = vec3(c * p.x + s * p.z, p.y, -s * p.x + c * p.z);
+    gl_Position = projection * view * vec4(aCenterSpin.xyz + p, 1.0);
+    TexCoord = aTexCoord;
+}
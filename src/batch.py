@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import groupby
+
+import numpy as np
+from PIL import Image
+
+import ray_tracer
+from camera.camera import CAMERA
+from ray_tracing.environment import EnvironmentMap
+from scene_builder import EPHEMERIS
+from utils.json_parser import parse_jobs
+
+# headless batch renderer, run from the repository root: python src/batch.py jobs.json
+# the jobs of the file are grouped by scene time, the persistent scene is moved to each time once
+# (planet positions, shadow casters or BVH) and shared by every camera of that time
+# progress goes to stderr, a json status report goes to stdout (or --status) and the exit code is
+# EXIT_OK when every job rendered, EXIT_FAILED when some failed and EXIT_INVALID for a bad job file
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INVALID = 2
+# render settings a job file can override in its "settings" object
+SETTINGS = {
+    "width": ray_tracer.WIDTH,
+    "height": ray_tracer.HEIGHT,
+    "samples": ray_tracer.SAMPLES_PER_PIXEL,
+    "backend": ray_tracer.BACKEND,
+    "workers": ray_tracer.WORKERS,
+    "tile_size": ray_tracer.TILE_SIZE,
+}
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def output_path(job, output_dir):
+    # default name keeps the job order and the camera so the images of a time range sort correctly
+    return os.path.join(output_dir, job["output"] or f"{job['index']:04d}_{job['camera']}.png")
+
+
+def group_by_time(jobs):
+    # [(time, jobs)] sorted by time, jobs of one time keep their file order
+    ordered = sorted(jobs, key=lambda job: (job["time"], job["index"]))
+    return [(t, list(group)) for t, group in groupby(ordered, key=lambda job: job["time"])]
+
+
+def render_job(scene, job, settings, seed):
+    # tonemapped image of one camera, the jitter only depends on the seed and the job index
+    camera = CAMERA(None, camera_eye=job["eye"], camera_target=job["target"], camera_up=job["up"],
+                    width=settings["width"], height=settings["height"])
+    # the baked background depends on the eye, it is the only per camera part of the scene
+    scene.environment = EnvironmentMap(scene, job["eye"], *ray_tracer.ENV_MAP_SIZE) if ray_tracer.ENV_MAP_SIZE else None
+    jitter = np.random.default_rng([seed, job["index"]]).random(
+        (settings["height"], settings["width"], settings["samples"], 2))
+    image = ray_tracer.render_image(scene, camera, jitter, backend=settings["backend"],
+                                    workers=settings["workers"], tile_size=settings["tile_size"], desc=None)
+    return ray_tracer.tonemap(image)
+
+
+def run_jobs(jobs, settings, output_dir, seed=0, skip_existing=False):
+    """
+    render the jobs, one scene per distinct time
+    returns one result dict per job in job order with "status" "done", "skipped" or "failed"
+    a failing job is reported and the others still render
+    """
+    results = {}
+    groups = group_by_time(jobs)
+    # body positions of every time of the file in one vectorized call, build_scene picks its row
+    EPHEMERIS.positions([scene_time for scene_time, _ in groups])
+    for number, (scene_time, group) in enumerate(groups, 1):
+        todo = [job for job in group if not (skip_existing and os.path.exists(output_path(job, output_dir)))]
+        for job in group:
+            if job not in todo:
+                results[job["index"]] = {"status": "skipped", "seconds": 0.0}
+        if not todo:
+            continue
+
+        log(f"time {scene_time}: building the scene for {len(todo)} camera(s) ({number}/{len(groups)})")
+        start = time.perf_counter()
+        try:
+            scene = ray_tracer.build_scene(scene_time)
+        except Exception as error:
+            for job in todo:
+                results[job["index"]] = {"status": "failed", "error": f"scene: {error!r}", "seconds": 0.0}
+            continue
+        setup = time.perf_counter() - start
+
+        for job in todo:
+            path = output_path(job, output_dir)
+            start = time.perf_counter()
+            try:
+                image = render_job(scene, job, settings, seed)
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                Image.fromarray(image).save(path)
+                results[job["index"]] = {"status": "done", "seconds": time.perf_counter() - start}
+                log(f"  {job['camera']}: {path}")
+            except Exception as error:
+                results[job["index"]] = {"status": "failed", "error": repr(error),
+                                         "seconds": time.perf_counter() - start}
+                log(f"  {job['camera']}: failed, {error!r}")
+        # the shared scene setup is reported once, on the first rendered job of the time
+        results[todo[0]["index"]]["scene_seconds"] = setup
+
+    return [
+        dict(results[job["index"]], index=job["index"], time=job["time"], camera=job["camera"],
+             output=output_path(job, output_dir))
+        for job in jobs
+    ]
+
+
+def write_status(status, path):
+    text = json.dumps(status, indent=2)
+    if path is None:
+        print(text)
+        return
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the jobs of a job file without any interaction")
+    parser.add_argument("job_file", help="json file with cameras and jobs, see utils.json_parser.parse_jobs")
+    parser.add_argument("--output-dir", help="directory of the images, overrides output_dir of the job file")
+    parser.add_argument("--status", help="write the json status report to this file instead of stdout")
+    parser.add_argument("--skip-existing", action="store_true", help="do not render jobs whose image exists")
+    parser.add_argument("--dry-run", action="store_true", help="only report the jobs grouped by time")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        jobs, options = parse_jobs(args.job_file)
+        unknown = set(options.get("settings", {})) - set(SETTINGS)
+        if unknown:
+            raise ValueError(f"unknown settings: {', '.join(sorted(unknown))}")
+        settings = dict(SETTINGS, **options.get("settings", {}))
+        ray_tracer.render_settings(settings["backend"])  # rejects an unknown backend before rendering
+    except (OSError, KeyError, TypeError, ValueError) as error:
+        write_status({"status": "invalid", "error": repr(error), "jobs": []}, args.status)
+        return EXIT_INVALID
+
+    output_dir = args.output_dir or options.get("output_dir", "frames")
+    if args.dry_run:
+        plan = [{"time": t, "cameras": [job["camera"] for job in group]} for t, group in group_by_time(jobs)]
+        write_status({"status": "planned", "groups": plan, "jobs": len(jobs)}, args.status)
+        return EXIT_OK
+
+    results = run_jobs(jobs, settings, output_dir, seed=options.get("seed", 0), skip_existing=args.skip_existing)
+    failed = sum(result["status"] == "failed" for result in results)
+    write_status({
+        "status": "failed" if failed else "ok",
+        "failed": failed,
+        "groups": len(group_by_time(jobs)),
+        "seconds": time.perf_counter() - started,
+        "jobs": results,
+    }, args.status)
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
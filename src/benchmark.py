@@ -0,0 +1,360 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+import ray_tracer
+from camera.camera import CAMERA
+from ray_tracing.jit import JIT_AVAILABLE, jit_scene, verify_jit
+from ray_tracing.ray import ray_color
+from ray_tracing.render import RenderSettings, render_rays
+from ray_tracing.scene import Scene
+from ray_tracing.sphere import Sphere
+from ray_tracing.texture_cache import texture_cache
+from ray_tracing.wavefront import WavefrontRenderer
+from scene_builder import PLANET_DATA
+
+# benchmark suite of the ray tracer, run from the repository root: python src/benchmark.py
+# microbenchmarks time the scalar building blocks per call, frame benchmarks time whole renders
+# the results are compared against a json baseline and slower entries are reported as regressions
+# the parity check renders small golden frames with the reference path (scalar ray_color on every
+# the jit check runs verify_jit on the golden frames, interpreted kernels when numba is not installed
+# the jit check runs verify_jit on the golden frames, it is skipped when numba is not installed
+
+BASELINE_PATH = "benchmarks/baseline.json"
+GOLDEN_PATH = "benchmarks/golden.npz"
+REGRESSION_THRESHOLD = 0.10  # an entry is a regression when it is this fraction slower than the baseline
+REPEATS = 5                  # timed runs per microbenchmark, the fastest one counts
+FRAME_REPEATS = 2            # timed runs per frame benchmark
+MICRO_RAYS = 256             # rays per microbenchmark run
+SCENE_TIME = 86400           # scene time of all benchmarks
+BENCH_SEED = 0
+FRAME_VIEW = ((0.0, 1.5, 3.0), (0.0, 0.0, 0.0), (0.0, 1.0, 0.0))  # fixed (eye, target, up) so baselines compare
+FRAME_BACKENDS = ("scalar", "wavefront")
+FRAME_RESOLUTIONS = ((80, 20), (160, 40), (320, 80))
+FRAME_SAMPLES = (1, 4)
+FRAME_ASTEROIDS = (0, 1000)  # extra bodies on top of the planets, large counts go through the BVH
+QUICK_RESOLUTIONS = ((80, 20),)
+QUICK_SAMPLES = (1,)
+QUICK_ASTEROIDS = (0,)
+PARITY_TOLERANCE = 1e-3      # largest allowed difference of a pixel channel (0-255) in the parity check
+GOLDEN_SIZE = (64, 24)
+GOLDEN_SAMPLES = 2
+# (eye, target, time) of the golden frames, a target of None looks at Saturn
+GOLDEN_VIEWS = (
+    ((0.0, 1.5, 3.0), (0.0, 0.0, 0.0), 86400),
+    ((9.0, 0.6, 9.0), (0.0, 0.0, 0.0), 86400),
+    ((12.0, 3.0, 0.0), None, 0),
+)
+
+
+def best_time(fn, repeats):
+    # seconds of the fastest of repeats calls, the others are disturbed by the rest of the machine
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def entry(seconds, rays):
+    return {"seconds": seconds, "rays": rays, "rays_per_sec": rays / seconds if seconds > 0 else float("inf")}
+
+
+def aimed_rays(origin, targets, rng, spread=0.0):
+    # (N, 3) origins and unit directions from origin to each target, optionally perturbed
+    dirs = np.asarray(targets, dtype=np.float64) - origin
+    dirs /= np.linalg.norm(dirs, axis=1, keepdims=True)
+    if spread:
+        dirs += rng.normal(scale=spread, size=dirs.shape)
+        dirs /= np.linalg.norm(dirs, axis=1, keepdims=True)
+    return np.broadcast_to(np.asarray(origin, dtype=np.float64), dirs.shape), dirs
+
+
+def planet_rays(planet, sun, rng, count, side=0.0):
+    # rays from outside the planet onto its day side, side tilts the origins away from the sun line
+    to_sun = sun.center - planet.center
+    to_sun = to_sun / np.linalg.norm(to_sun)
+    across = np.cross(to_sun, [0.0, 1.0, 0.0])
+    across /= np.linalg.norm(across)
+    origin = planet.center + (to_sun * (1.0 - side) + across * side) * planet.radius * 4
+    return aimed_rays(origin, np.repeat(planet.center[None], count, axis=0), rng, spread=0.03)
+
+
+def branch_cases(scene, rng, count):
+    """
+    rays that take each branch of ray_color, as {name: (scene, origins, dirs)}
+    the shadow case adds a large occluder between a planet and the sun, the solar system
+    itself has no stable eclipse to aim at
+    """
+    sun = scene.light
+    earth = scene.spheres[3]
+    saturn_ring = scene.rings[0]
+    eye = np.array(FRAME_VIEW[0])
+    cases = {}
+
+    # rays pointing away from the sun, keeping the ones that leave the scene
+    origins, dirs = aimed_rays(eye, np.repeat((2 * eye - sun.center)[None], count * 4, axis=0), rng, spread=0.3)
+    missed = [k for k in range(len(dirs)) if scene.hit(origins[k], dirs[k]) is None][:count]
+    cases["background"] = (scene, origins[missed], dirs[missed])
+
+    cases["sun"] = (scene, *aimed_rays(eye, np.repeat(sun.center[None], count, axis=0), rng, spread=0.02))
+    cases["planet_lit"] = (scene, *planet_rays(earth, sun, rng, count))
+
+    # rays from above the ring plane onto points of the ring band
+    angles = rng.uniform(0, 2 * np.pi, count)
+    radii = rng.uniform(saturn_ring.inner_radius, saturn_ring.outer_radius, count)
+    band = saturn_ring.center + np.column_stack([np.cos(angles) * radii, np.zeros(count), np.sin(angles) * radii])
+    ring_origin = saturn_ring.center + np.array([0.0, saturn_ring.outer_radius * 2, saturn_ring.outer_radius])
+    cases["ring"] = (scene, *aimed_rays(ring_origin, band, rng))
+
+    # occluder three radii towards the sun, the rays come in from the side so they pass it
+    to_sun = (sun.center - earth.center) / np.linalg.norm(sun.center - earth.center)
+    occluder = Sphere(earth.center + to_sun * earth.radius * 3, earth.radius * 1.5, earth.material)
+    eclipse = Scene(scene.spheres + [occluder], sun, rings=scene.rings,
+                    background_texture=scene.background_texture)
+    cases["planet_shadow"] = (eclipse, *planet_rays(earth, sun, rng, count, side=0.8))
+    return cases
+
+
+def micro_benchmarks(scene, repeats=REPEATS, rays=MICRO_RAYS):
+    # seconds per call and calls per second of the scalar building blocks
+    rng = np.random.default_rng(BENCH_SEED)
+    results = {}
+    earth = scene.spheres[3]
+    saturn_ring = scene.rings[0]
+
+    def per_ray(name, fn, origins, dirs):
+        fn(origins[0], dirs[0])  # first call decodes textures and builds cached variants
+        seconds = best_time(lambda: [fn(o, d) for o, d in zip(origins, dirs)], repeats)
+        results[name] = entry(seconds / len(dirs), 1)
+
+    origins, dirs = planet_rays(earth, scene.light, rng, rays)
+    per_ray("micro/Sphere.hit", earth.hit, origins, dirs)
+
+    cases = branch_cases(scene, rng, rays)
+    _, origins, dirs = cases["ring"]
+    per_ray("micro/Ring.hit", saturn_ring.hit, origins, dirs)
+
+    camera = CAMERA(None, *FRAME_VIEW, width=32, height=8)
+    origins, dirs = camera.get_rays(rng.random((8, 32, 1, 2)))
+    per_ray("micro/Scene.hit", scene.hit, origins.reshape(-1, 3), dirs.reshape(-1, 3))
+
+    texture = texture_cache.get(PLANET_DATA[3][2])
+    u, v = rng.random(rays), rng.random(rays)
+    per_ray("micro/ImageTexture.value", texture.value, u, v)
+
+    for name, (case_scene, origins, dirs) in cases.items():
+        if not len(dirs):
+            continue
+        per_ray(f"micro/ray_color/{name}",
+                lambda o, d, s=case_scene: ray_color(o, d, s, ray_tracer.AMBIENT, ray_tracer.MAX_DEPTH),
+                origins, dirs)
+    return results
+
+
+def frame_benchmarks(backends=FRAME_BACKENDS, resolutions=FRAME_RESOLUTIONS, samples=FRAME_SAMPLES,
+                     asteroids=FRAME_ASTEROIDS, repeats=FRAME_REPEATS):
+    # per frame time and rays per second of whole renders, like render_frame without writing the PNG
+    eye, target, up = FRAME_VIEW
+    results = {}
+    for bodies in asteroids:
+        scene = ray_tracer.build_scene(SCENE_TIME, asteroids=bodies)
+        for width, height in resolutions:
+            camera = CAMERA(None, camera_eye=eye, camera_target=target, camera_up=up, width=width, height=height)
+            for spp in samples:
+                jitter = np.random.default_rng(BENCH_SEED).random((height, width, spp, 2))
+                for backend in backends:
+                    render = lambda: ray_tracer.render_image(scene, camera, jitter, backend=backend, workers=1,
+                                                             desc=None)
+                    render()  # warm up, textures are decoded on the first hit
+                    name = f"frame/{backend}/{width}x{height}/spp{spp}/bodies{len(scene.objects)}"
+                    results[name] = entry(best_time(render, repeats), width * height * spp)
+                    print(f"{name}: {results[name]['seconds']:.3f} s, {results[name]['rays_per_sec']:.0f} rays/s")
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    entries of results that got slower than the baseline by more than threshold
+    returns a list of (name, baseline seconds, seconds), entries missing on either side are skipped
+    """
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        if current["seconds"] > previous["seconds"] * (1 + threshold):
+            regressions.append((name, previous["seconds"], current["seconds"]))
+    return regressions
+
+
+def machine():
+    return {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+            "processor": platform.processor(), "cpus": os.cpu_count(), "jit": JIT_AVAILABLE}
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def golden_frames():
+    # (name, scene, camera, jitter) of the golden frames, one at a time: build_scene moves the
+    # same scene in place, so a frame is only valid until the next one is generated
+    width, height = GOLDEN_SIZE
+    for k, (eye, target, scene_time) in enumerate(GOLDEN_VIEWS):
+        scene = ray_tracer.build_scene(scene_time)
+        if target is None:
+            target = scene.rings[0].center
+        camera = CAMERA(None, camera_eye=eye, camera_target=target, camera_up=(0.0, 1.0, 0.0),
+                        width=width, height=height)
+        jitter = np.random.default_rng(k).random((height, width, GOLDEN_SAMPLES, 2))
+        yield f"view{k}", scene, camera, jitter
+
+
+def optimized_paths(scene, camera, jitter):
+    # every faster way of rendering the frame, as {name: image}
+    settings = ray_tracer.render_settings
+    origins, directions = camera.get_rays(jitter)
+    images = {
+        "wavefront": render_rays(scene, origins, directions, settings("wavefront")),
+        "tiles_binned_scalar": ray_tracer.render_image(scene, camera, jitter, backend="scalar", workers=1, desc=None),
+        "tiles_binned_wavefront": ray_tracer.render_image(scene, camera, jitter, backend="wavefront", workers=1,
+                                                          desc=None),
+    }
+    # the jit kernels are only exercised when numba is installed, otherwise jit is the wavefront path
+    if JIT_AVAILABLE:
+        images["jit"] = WavefrontRenderer(jit_scene(scene), ray_tracer.AMBIENT,
+                                          chunk_size=ray_tracer.CHUNK_SIZE).render(origins, directions)
+    return images
+
+
+def parity_check(golden_path=GOLDEN_PATH, update=False, tolerance=PARITY_TOLERANCE):
+    """
+    render the golden frames with the reference path and compare them with the stored golden
+    images (replaced with update) and with every optimized path
+    returns a list of failure messages, empty when everything matches, a missing golden file is a
+    failure unless update writes it
+    """
+    failures = []
+    reference = {}
+    for name, scene, camera, jitter in golden_frames():
+        origins, directions = camera.get_rays(jitter)
+        reference[name] = render_rays(scene, origins, directions, RenderSettings(
+            ray_tracer.AMBIENT, ray_tracer.MAX_DEPTH, "scalar", ray_tracer.CHUNK_SIZE))
+        for path, image in optimized_paths(scene, camera, jitter).items():
+            diff = float(np.max(np.abs(image - reference[name])))
+            status = "ok" if diff <= tolerance else "FAILED"
+            print(f"parity {name}/{path}: max difference {diff:.2e} {status}")
+            if diff > tolerance:
+                failures.append(f"{name}/{path} differs from the reference by {diff:.2e}")
+
+    if update:
+        os.makedirs(os.path.dirname(golden_path) or ".", exist_ok=True)
+        np.savez_compressed(golden_path, **reference)
+        print(f"golden images written to {golden_path}")
+        return failures
+    if not os.path.exists(golden_path):
+        # writing it here would compare the code against itself and always pass
+        failures.append(f"no golden images at {golden_path}, record them from a trusted build with --update-golden")
+        return failures
+
+    with np.load(golden_path) as golden:
+        for name, image in reference.items():
+            if name not in golden or golden[name].shape != image.shape:
+                failures.append(f"{name} is missing from {golden_path}, rerun with --update-golden")
+                continue
+            diff = float(np.max(np.abs(image - golden[name])))
+            print(f"golden {name}: max difference {diff:.2e} {'ok' if diff <= tolerance else 'FAILED'}")
+            if diff > tolerance:
+                failures.append(f"{name} differs from the golden image by {diff:.2e}")
+    return failures
+
+
+def jit_check(tolerance=PARITY_TOLERANCE):
+    """
+    verify_jit of the jit kernels against ray_color on every golden frame
+    without numba the kernels run interpreted, which is slow but checks the same code
+    returns a list of failure messages, empty when everything matches
+    """
+    if not JIT_AVAILABLE:
+        print("numba is not installed, the jit kernels are checked interpreted")
+    failures = []
+    for name, scene, camera, jitter in golden_frames():
+        try:
+            diff = verify_jit(scene, camera, jitter, ray_tracer.render_settings("jit"), tolerance, kernels=True)
+            print(f"jit {name}: max difference {diff:.2e} ok")
+        except AssertionError as error:
+            print(f"jit {name}: FAILED")
+            failures.append(f"{name}: {error}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ray tracer and check it against golden images")
+    parser.add_argument("--quick", action="store_true", help="one small frame configuration instead of the matrix")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="json baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="fraction an entry may be slower than the baseline")
+    parser.add_argument("--output", help="also write the results to this json file")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-frames", action="store_true")
+    parser.add_argument("--skip-parity", action="store_true")
+    parser.add_argument("--skip-jit", action="store_true")
+    parser.add_argument("--update-golden", action="store_true", help="write the golden images, required once")
+    args = parser.parse_args(argv)
+
+    results = {}
+    if not args.skip_micro:
+        results.update(micro_benchmarks(ray_tracer.build_scene(SCENE_TIME)))
+        for name, result in sorted(results.items()):
+            print(f"{name}: {result['seconds'] * 1e6:.1f} us, {result['rays_per_sec']:.0f} calls/s")
+    if not args.skip_frames:
+        if args.quick:
+            results.update(frame_benchmarks(resolutions=QUICK_RESOLUTIONS, samples=QUICK_SAMPLES,
+                                            asteroids=QUICK_ASTEROIDS, repeats=1))
+        else:
+            results.update(frame_benchmarks())
+
+    report = {"machine": machine(), "results": results}
+    if args.output:
+        save_json(args.output, report)
+
+    failed = False
+    if results and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != report["machine"]:
+            print(f"warning: {args.baseline} was recorded on another machine or setup")
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.4g} s -> {after:.4g} s ({after / before - 1:+.0%})")
+        failed |= bool(regressions)
+    if results and args.save_baseline:
+        save_json(args.baseline, report)
+        print(f"baseline written to {args.baseline}")
+
+    if not args.skip_parity:
+        failures = parity_check(update=args.update_golden)
+        for message in failures:
+            print(f"PARITY {message}")
+        failed |= bool(failures)
+    if not args.skip_jit:
+        failures = jit_check()
+        for message in failures:
+            print(f"JIT {message}")
+        failed |= bool(failures)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
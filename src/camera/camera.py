@@ -100,6 +100,15 @@ class CAMERA:
         )
         return matrix44.multiply(rotation_matrix, view)
     
+    def get_basis(self):
+        """
+        Returns the normalized (forward, right, up) world space camera basis.
+        """
+        forward = normalize(self.camera_target - self.camera_eye)
+        right = normalize(np.cross(forward, self.camera_up))
+        up = normalize(np.cross(right, forward))
+        return forward, right, up
+
     def get_ray(self, x, y, dx=0.5, dy=0.5, fov=60.0):
         # ndc from -1 , 1
         ndc_x = ((x + dx) / self.width) * 2.0 - 1.0
@@ -115,9 +124,7 @@ class CAMERA:
         ray_dir_camera = normalize(ray_dir_camera)
 
         # transform ray_dir_camera to world space
-        forward = normalize(self.camera_target - self.camera_eye)
-        right = normalize(np.cross(forward, self.camera_up))
-        up = normalize(np.cross(right, forward))
+        forward, right, up = self.get_basis()
 
         # construct world ray
         ray_dir_world = normalize(
@@ -126,4 +133,160 @@ class CAMERA:
             ray_dir_camera[2] * -forward  
         )
 
-        return self.camera_eye, ray_dir_world
\ No newline at end of file
+        return self.camera_eye, ray_dir_world
+
+    def get_rays(self, jitter=None, samples=1, fov=60.0, region=None):
+        """
+        Batched version of get_ray for every pixel and sample of the frame.
+
+        Args:
+            jitter (np.ndarray): Optional (H, W, S, 2) array of sub-pixel offsets
+                (dx, dy) in [0, 1). When omitted every sample goes through the
+                pixel center.
+            samples (int): Number of samples per pixel, only used without jitter.
+            fov (float): Vertical field of view in degrees.
+            region (tuple): Optional (y0, y1, x0, x1) pixel window. Only the rays of
+                that window are built and H, W are the window size.
+
+        Returns:
+            tuple:
+                - origins (np.ndarray): (H, W, S, 3) read-only broadcast of the eye.
+                - directions (np.ndarray): (H, W, S, 3) normalized world space directions.
+        """
+        y0, y1, x0, x1 = region if region is not None else (0, self.height, 0, self.width)
+        if jitter is None:
+            jitter = np.full((y1 - y0, x1 - x0, samples, 2), 0.5)
+        jitter = np.asarray(jitter, dtype=np.float64)
+        if jitter.shape[:2] != (y1 - y0, x1 - x0) or jitter.shape[-1] != 2:
+            raise ValueError(
+                f"jitter must have shape ({y1 - y0}, {x1 - x0}, S, 2), got {jitter.shape}"
+            )
+
+        # pixel indices broadcast against the samples axis
+        xs = np.arange(x0, x1, dtype=np.float64)[None, :, None]
+        ys = np.arange(y0, y1, dtype=np.float64)[:, None, None]
+        return self._sample_rays(xs, ys, jitter, fov)
+
+    def get_pixel_rays(self, ys, xs, jitter, fov=60.0):
+        """
+        Batched get_ray for an arbitrary list of pixels, used to add samples to single pixels.
+
+        Args:
+            ys, xs (np.ndarray): (P,) pixel coordinates.
+            jitter (np.ndarray): (P, S, 2) sub-pixel offsets (dx, dy) in [0, 1).
+            fov (float): Vertical field of view in degrees.
+
+        Returns:
+            tuple:
+                - origins (np.ndarray): (P, S, 3) read-only broadcast of the eye.
+                - directions (np.ndarray): (P, S, 3) normalized world space directions,
+                  identical to the ones get_rays builds for the same pixels and offsets.
+        """
+        jitter = np.asarray(jitter, dtype=np.float64)
+        if jitter.shape[0] != len(ys) or jitter.ndim != 3 or jitter.shape[-1] != 2:
+            raise ValueError(f"jitter must have shape ({len(ys)}, S, 2), got {jitter.shape}")
+        xs = np.asarray(xs, dtype=np.float64)[:, None]
+        ys = np.asarray(ys, dtype=np.float64)[:, None]
+        return self._sample_rays(xs, ys, jitter, fov)
+
+    def project_sphere(self, center, radius, fov=60.0):
+        """
+        Conservative screen space bounds of a sphere for the rays of get_rays.
+
+        Args:
+            center (array-like): World space center of the sphere.
+            radius (float): Radius of the sphere.
+            fov (float): Vertical field of view in degrees.
+
+        Returns:
+            tuple: (y0, y1, x0, x1) pixel window clipped to the frame, covering every
+                pixel whose rays can hit the sphere. The whole frame when the sphere
+                crosses the camera plane, None when it is outside of the frame or
+                entirely behind the camera.
+        """
+        window = self.project_spheres(np.reshape(center, (1, 3)), np.reshape(radius, (1,)), fov)[0]
+        y0, y1, x0, x1 = (int(w) for w in window)
+        if y0 >= y1 or x0 >= x1:
+            return None
+        return y0, y1, x0, x1
+
+    def project_spheres(self, centers, radii, fov=60.0):
+        """
+        Vectorized project_sphere for many spheres.
+
+        The corners of the bounding box of every sphere are projected, the bounds of a
+        convex box contain the projection of everything inside it.
+
+        Args:
+            centers (np.ndarray): (M, 3) world space centers.
+            radii (np.ndarray): (M,) radii.
+            fov (float): Vertical field of view in degrees.
+
+        Returns:
+            np.ndarray: (M, 4) int array of (y0, y1, x0, x1) windows clipped to the frame,
+                empty (y0 >= y1 or x0 >= x1) for spheres outside of the frame or entirely
+                behind the camera, the whole frame for spheres crossing the camera plane.
+        """
+        forward, right, up = self.get_basis()
+        eye = np.asarray(self.camera_eye, dtype=np.float64)
+        signs = np.array([[sx, sy, sz] for sx in (-1, 1) for sy in (-1, 1) for sz in (-1, 1)], dtype=np.float64)
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 3)
+        radii = np.asarray(radii, dtype=np.float64).reshape(-1)
+        rel = centers[:, None, :] + radii[:, None, None] * signs - eye
+        depth = rel @ np.asarray(forward, dtype=np.float64)
+        behind = np.any(depth <= 1e-9, axis=1)
+        depth = np.where(depth <= 1e-9, 1.0, depth)
+
+        scale = np.tan(np.radians(fov * 0.5))
+        ndc_x = (rel @ np.asarray(right, dtype=np.float64)) / depth / (self.aspect_ratio * scale)
+        ndc_y = (rel @ np.asarray(up, dtype=np.float64)) / depth / scale
+        px = (ndc_x + 1.0) * 0.5 * self.width
+        py = (1.0 - ndc_y) * 0.5 * self.height
+
+        # one pixel of margin for the sub-pixel offsets and rounding
+        windows = np.column_stack([
+            np.floor(py.min(axis=1)) - 1, np.ceil(py.max(axis=1)) + 1,
+            np.floor(px.min(axis=1)) - 1, np.ceil(px.max(axis=1)) + 1,
+        ])
+        limits = np.array([self.height, self.height, self.width, self.width], dtype=np.float64)
+        windows = np.clip(windows, 0, limits).astype(np.int64)
+        # spheres reaching behind the camera can cover any pixel, unless no part of them is in front
+        # of the eye: the nearest point of the sphere is behind it and no camera ray reaches it
+        windows[behind] = (0, self.height, 0, self.width)
+        windows[(centers - eye) @ np.asarray(forward, dtype=np.float64) + radii <= 1e-9] = 0
+        return windows
+
+    def _sample_rays(self, xs, ys, jitter, fov):
+        # xs and ys broadcast against jitter[..., 0], the directions get the shape of jitter[..., 0]
+        # ndc from -1 , 1
+        ndc_x = ((xs + jitter[..., 0]) / self.width) * 2.0 - 1.0
+        ndc_y = 1.0 - ((ys + jitter[..., 1]) / self.height) * 2.0
+
+        # ndc to viewport
+        scale = np.tan(np.radians(fov * 0.5))
+        viewport_x = ndc_x * self.aspect_ratio * scale
+        viewport_y = ndc_y * scale
+
+        # normalized ray in camera space, z is always -1
+        inv_len = 1.0 / np.sqrt(viewport_x**2 + viewport_y**2 + 1.0)
+        cam_x = viewport_x * inv_len
+        cam_y = viewport_y * inv_len
+        cam_z = -inv_len
+
+        # camera basis is computed once for the whole frame
+        forward, right, up = self.get_basis()
+        forward = np.asarray(forward, dtype=np.float64)
+        right = np.asarray(right, dtype=np.float64)
+        up = np.asarray(up, dtype=np.float64)
+
+        directions = (
+            cam_x[..., None] * right +
+            cam_y[..., None] * up +
+            cam_z[..., None] * -forward
+        )
+        directions /= np.linalg.norm(directions, axis=-1, keepdims=True)
+
+        origins = np.broadcast_to(
+            np.asarray(self.camera_eye, dtype=np.float64), directions.shape
+        )
+        return origins, directions
@@ -0,0 +1,201 @@
+from collections import OrderedDict
+
+import numpy as np
+
+# Keplerian elements a body can set on top of its PLANET_DATA entry, all default to a circular
+# orbit in the ecliptic (the xz plane), angles are in radians
+ELEMENT_DEFAULTS = {
+    "eccentricity": 0.0,
+    "inclination": 0.0,
+    "ascending_node": 0.0,       # longitude of the ascending node
+    "periapsis": 0.0,            # argument of periapsis
+    "mean_anomaly": 0.0,         # mean anomaly at t = 0
+}
+KEPLER_TOLERANCE = 1e-12
+KEPLER_ITERATIONS = 32
+CACHE_GRIDS = 8                  # time grids kept by Ephemeris.positions
+
+
+def solve_kepler(mean_anomaly, eccentricity, tol=KEPLER_TOLERANCE, max_iter=KEPLER_ITERATIONS):
+    """Eccentric anomaly E with E - e sin(E) = M for arrays of M and e (elliptical, e < 1).
+
+    Newton iterations on all elements at once, only the ones that did not converge are updated.
+
+    Args:
+        mean_anomaly (np.ndarray): Mean anomalies M in radians.
+        eccentricity (np.ndarray): Eccentricities broadcastable against M.
+        tol (float): Largest remaining correction of a converged element.
+        max_iter (int): Upper bound of Newton steps.
+
+    Returns:
+        np.ndarray: Eccentric anomalies, in the same revolution as M.
+    """
+    m = np.asarray(mean_anomaly, dtype=np.float64)
+    shape = m.shape
+    # the iterations run on flat copies, so any shape of M (e.g. times x bodies) tracks every element
+    e = np.broadcast_to(np.asarray(eccentricity, dtype=np.float64), shape).ravel()
+    m = m.ravel()
+    # the solver works on M reduced to [-pi, pi), the whole revolutions are added back at the end
+    turns = np.round(m / (2 * np.pi)) * 2 * np.pi
+    m = m - turns
+    # starting at pi for very eccentric orbits keeps Newton from overshooting near periapsis
+    E = np.where(e < 0.8, m, np.where(m < 0, -np.pi, np.pi))
+    active = np.arange(len(m))  # flat indices of the elements that did not converge yet
+    for _ in range(max_iter):
+        f = E[active] - e[active] * np.sin(E[active]) - m[active]
+        step = f / (1.0 - e[active] * np.cos(E[active]))
+        E[active] -= step
+        active = active[np.abs(step) > tol]
+        if not len(active):
+            break
+    return (E + turns).reshape(shape)
+
+
+class Ephemeris:
+    """Positions of every body of PLANET_DATA over arrays of times.
+
+    Bodies orbit their parent (the origin without one), so moons of moons work at any depth.
+    Elliptical orbits go through solve_kepler; circular orbits in the ecliptic use the closed
+    form angle = orbit_speed * t directly, which keeps them bit for bit equal to the old
+    per body formula.
+
+    Args:
+        data: PLANET_DATA style tuples (name, radius, texture, orbit_radius, orbit_speed,
+            rotation_speed[, parent]), orbit_radius is the semi-major axis and orbit_speed
+            the mean motion in radians per time unit.
+        elements: Optional {name: {element: value}} overrides of ELEMENT_DEFAULTS.
+    """
+    def __init__(self, data, elements=None):
+        elements = elements or {}
+        self.names = [body[0] for body in data]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        unknown = set(elements) - set(self.index)
+        if unknown:
+            raise ValueError(f"orbit elements for unknown bodies: {', '.join(sorted(unknown))}")
+
+        self.parent = np.array([self.index[body[6]] if len(body) == 7 else -1 for body in data], dtype=np.intp)
+        self.semi_major = np.array([body[3] for body in data], dtype=np.float64)
+        self.mean_motion = np.array([body[4] for body in data], dtype=np.float64)
+        for key, default in ELEMENT_DEFAULTS.items():
+            setattr(self, key, np.array([elements.get(name, {}).get(key, default) for name in self.names],
+                                        dtype=np.float64))
+        if np.any((self.eccentricity < 0) | (self.eccentricity >= 1)):
+            raise ValueError("eccentricities must be in [0, 1)")
+
+        # parents before children, so one pass adds every parent position once it is final
+        depth = {}
+        for i in range(len(self.names)):
+            chain, j = [], i
+            while j >= 0 and j not in depth:
+                chain.append(j)
+                j = self.parent[j]
+                if j in chain:
+                    raise ValueError(f"orbit parents of {self.names[i]} form a cycle")
+            for j in reversed(chain):
+                depth[j] = depth[self.parent[j]] + 1 if self.parent[j] >= 0 else 0
+        self.order = sorted(range(len(self.names)), key=lambda i: depth[i])
+
+        self.circular = ((self.eccentricity == 0) & (self.inclination == 0) & (self.ascending_node == 0)
+                         & (self.periapsis == 0) & (self.mean_anomaly == 0))
+        self._rotation = self._orbit_rotation()
+        self._cache = OrderedDict()
+
+    def _orbit_rotation(self):
+        # (B, 3, 2) map of the in-plane (p, q) coordinates to world (x, y, z), y is the ecliptic pole
+        cw, sw = np.cos(self.periapsis), np.sin(self.periapsis)
+        cn, sn = np.cos(self.ascending_node), np.sin(self.ascending_node)
+        ci, si = np.cos(self.inclination), np.sin(self.inclination)
+        return np.stack([
+            np.stack([cn * cw - sn * sw * ci, -cn * sw - sn * cw * ci], axis=-1),
+            np.stack([sw * si, cw * si], axis=-1),
+            np.stack([sn * cw + cn * sw * ci, -sn * sw + cn * cw * ci], axis=-1),
+        ], axis=1)
+
+    def local_positions(self, times):
+        """(T, B, 3) positions of every body relative to its parent."""
+        times = np.asarray(times, dtype=np.float64)
+        out = np.zeros((len(times), len(self.names), 3))
+
+        # circular orbits in the ecliptic: the closed form of the original per body code
+        circ = np.nonzero(self.circular)[0]
+        angle = self.mean_motion[circ] * times[:, None]
+        out[:, circ, 0] = self.semi_major[circ] * np.cos(angle)
+        out[:, circ, 2] = self.semi_major[circ] * np.sin(angle)
+
+        kepler = np.nonzero(~self.circular)[0]
+        if len(kepler):
+            e = self.eccentricity[kepler]
+            a = self.semi_major[kepler]
+            E = solve_kepler(self.mean_motion[kepler] * times[:, None] + self.mean_anomaly[kepler], e)
+            p = a * (np.cos(E) - e)
+            q = a * np.sqrt(1.0 - e * e) * np.sin(E)
+            out[:, kepler] = np.einsum("bij,tbj->tbi", self._rotation[kepler], np.stack([p, q], axis=-1))
+        return out
+
+    def _place(self, times):
+        # (local, world) of every body at times, the world positions add up the parent chain
+        local = self.local_positions(times)
+        world = local.copy()
+        for i in self.order:
+            if self.parent[i] >= 0:
+                world[:, i] += world[:, self.parent[i]]
+        local.setflags(write=False)
+        world.setflags(write=False)
+        return local, world
+
+    def _grid(self, times):
+        # cached (rows, local, world) of a time grid, rows maps a time to its row
+        times = np.ascontiguousarray(times, dtype=np.float64).reshape(-1)
+        key = times.tobytes()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        local, world = self._place(times)
+        rows = {t: k for k, t in enumerate(times.tolist())}
+        self._cache[key] = (rows, local, world)
+        if len(self._cache) > CACHE_GRIDS:
+            self._cache.popitem(last=False)
+        return self._cache[key]
+
+    def _row(self, t):
+        t = float(t)
+        for rows, local, world in self._cache.values():
+            if t in rows:
+                return local[rows[t]], world[rows[t]]
+        # a time outside every grid, e.g. a viewer frame, is computed on its own and not cached,
+        # so it does not evict the grids of a video or a batch precompute
+        local, world = self._place(np.array([t]))
+        return local[0], world[0]
+
+    def positions(self, times):
+        """Positions of every body at every time, cached per time grid.
+
+        Args:
+            times: 1-D array of times, e.g. the frame times of a video.
+
+        Returns:
+            np.ndarray: (T, B, 3) world positions in the order of the data. The array is
+            shared with the cache and must not be modified.
+        """
+        return self._grid(times)[2]
+
+    def at(self, t):
+        """(B, 3) positions at time t, taken from a cached grid when one holds t, computed uncached otherwise."""
+        return self._row(t)[1]
+
+    def local_at(self, t):
+        """(B, 3) positions at time t relative to the parents, see at."""
+        return self._row(t)[0]
+
+    def position(self, name, t):
+        return self.at(t)[self.index[name]]
+
+    def orbit_path(self, name, segments=100):
+        """(segments, 3) closed path of the orbit of a body around its parent, for drawing."""
+        i = self.index[name]
+        E = np.linspace(0, 2 * np.pi, segments, endpoint=True)
+        e, a = self.eccentricity[i], self.semi_major[i]
+        p = a * (np.cos(E) - e)
+        q = a * np.sqrt(1.0 - e * e) * np.sin(E)
+        return np.stack([p, q], axis=-1) @ self._rotation[i].T
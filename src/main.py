@@ -1,6 +1,7 @@
 import pyrr
 from scene_builder import PLANET_DATA, get_camera_config
 from camera.camera import CAMERA
+from objects.asteroid_belt import AsteroidBeltGL
 from objects.planet import Planet
 from transformation.orbit import Orbit
 from effects.skybox import SkyboxGL
@@ -19,6 +20,7 @@ WINDOW_Y = 30
 WINDOW_TITLE = "Solar System Raytracing"
 SECTORS = 36
 STACKS = 18
+ASTEROIDS = 50000   # rocks in the instanced asteroid belt, 0 disables it
 
 def main():
     TIME, CAMERA_EYE, CAMERA_TARGET, CAMERA_UP = get_camera_config()
@@ -33,6 +35,7 @@ def main():
     renderer.create_shader()
 
     transform = Transform(data=PLANET_DATA, sectors=SECTORS, stacks=STACKS)
+    asteroid_belt = AsteroidBeltGL(ASTEROIDS) if ASTEROIDS else None
 
     camera = CAMERA(renderer.window, CAMERA_EYE, CAMERA_TARGET, CAMERA_UP)
 
@@ -102,6 +105,10 @@ def main():
             renderer.shader,
         )
 
+        # Draw the asteroid belt in one instanced draw call
+        if asteroid_belt:
+            asteroid_belt.draw(camera.get_view_matrix(), projection, time_elapsed)
+
         glfw.swap_buffers(renderer.window)
     glfw.terminate()
 
@@ -0,0 +1,151 @@
+import numpy as np
+from PIL import Image
+from OpenGL.GL import *
+from effects.skybox import load_shader
+from objects.sphere import Sphere
+from scene_builder import ASTEROID_TEXTURE, AsteroidBelt
+
+
+class AsteroidBeltGL:
+    """
+    An instanced asteroid belt drawn with a single draw call.
+
+    All asteroids share one low poly sphere mesh and the rock texture. The orbits come from
+    scene_builder.AsteroidBelt, so the belt matches the one of the ray tracer. The positions
+    and spin angles are computed vectorized in double precision every frame and streamed
+    into an instance buffer; the per asteroid scale lives in a static instance buffer.
+
+    Attributes:
+        belt (AsteroidBelt): Orbit parameters of every asteroid.
+        count (int): Number of asteroids.
+        scale (np.ndarray): (count, 3) scale of the mesh along each axis per asteroid.
+        spin_speed (np.ndarray): (count,) rotation speed around the Y-axis per asteroid.
+        vao, vbo, ebo, instance_vbo, scale_vbo: OpenGL buffer identifiers.
+    """
+
+    def __init__(self, count, texture_path=ASTEROID_TEXTURE, sectors=8, stacks=6, seed=0):
+        """
+        Initialize the belt geometry, the instance buffers, the texture and the shader.
+
+        Args:
+            count (int): Number of asteroids.
+            texture_path (str): File path to the texture image (default: rock.png).
+            sectors (int): Number of vertical subdivisions of the shared mesh (default: 8).
+            stacks (int): Number of horizontal subdivisions of the shared mesh (default: 6).
+            seed (int): Seed of the orbits, sizes and shapes (default: 0).
+        """
+        self.belt = AsteroidBelt(count, seed=seed)
+        self.count = count
+        self.texture_path = texture_path
+
+        # irregular rocks: the unit sphere is stretched differently along each axis
+        rng = np.random.default_rng(seed + 1)
+        self.scale = (self.belt.radius[:, None] * rng.uniform(0.6, 1.4, (count, 3))).astype(np.float32)
+        self.spin_speed = rng.uniform(-2.0, 2.0, count)
+        self.instances = np.zeros((count, 4), dtype=np.float32)
+
+        self.sphere = Sphere(r=1.0, sectors=sectors, stacks=stacks)
+        vertices, tex_coords = self.sphere.build_sphere_points()
+        self.indices = np.array(self.sphere.build_indices()[0], dtype=np.uint32)
+        self._prepare_buffers(self.sphere.combine_coordinates(vertices, tex_coords))
+        self._load_texture()
+        self.shader = load_shader("shaders/asteroid_vertex.glsl", "shaders/fragment_shader.glsl")
+
+    def _prepare_buffers(self, vertex_data):
+        """
+        Set up the shared mesh (VAO, VBO, EBO) and the two per instance buffers.
+        """
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+
+        # shared mesh: position (location = 0) and texture coordinate (location = 1)
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertex_data.nbytes, vertex_data, GL_STATIC_DRAW)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 5 * 4, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 5 * 4, ctypes.c_void_p(3 * 4))
+        glEnableVertexAttribArray(1)
+
+        # center and spin angle per instance (location = 2), rewritten every frame
+        self.instance_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.instances.nbytes, None, GL_STREAM_DRAW)
+        glVertexAttribPointer(2, 4, GL_FLOAT, GL_FALSE, 4 * 4, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(2)
+        glVertexAttribDivisor(2, 1)
+
+        # scale per instance (location = 3), uploaded once
+        self.scale_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.scale_vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.scale.nbytes, self.scale, GL_STATIC_DRAW)
+        glVertexAttribPointer(3, 3, GL_FLOAT, GL_FALSE, 3 * 4, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(3)
+        glVertexAttribDivisor(3, 1)
+
+        self.ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _load_texture(self):
+        """
+        Load and configure a 2D texture in OpenGL using the image at self.texture_path.
+        """
+        image = Image.open(self.texture_path)
+        img_data = np.array(image.convert("RGBA")).tobytes()
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, image.width, image.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+
+    def update(self, time_elapsed):
+        """
+        Compute the centers and spin angles of all asteroids and upload them.
+
+        The angles are reduced in double precision on the CPU, so large simulation times
+        do not make the asteroids jitter the way float32 math in the shader would.
+
+        Args:
+            time_elapsed (float): Simulation time.
+        """
+        self.instances[:, :3] = self.belt.positions(time_elapsed)
+        self.instances[:, 3] = np.mod(self.spin_speed * time_elapsed, 2 * np.pi)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        # orphan the old storage so the driver does not wait for the previous frame
+        glBufferData(GL_ARRAY_BUFFER, self.instances.nbytes, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, self.instances.nbytes, self.instances)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self, view, projection, time_elapsed):
+        """
+        Draw the whole belt with one instanced draw call.
+
+        Args:
+            view (np.ndarray): View matrix (4x4).
+            projection (np.ndarray): Projection matrix (4x4).
+            time_elapsed (float): Simulation time.
+        """
+        self.update(time_elapsed)
+        # the main loop sets its uniforms on the current program, so it is restored afterwards
+        previous_program = glGetIntegerv(GL_CURRENT_PROGRAM)
+        glUseProgram(self.shader)
+        glUniformMatrix4fv(glGetUniformLocation(self.shader, "view"), 1, GL_FALSE, np.asarray(view, dtype=np.float32))
+        glUniformMatrix4fv(glGetUniformLocation(self.shader, "projection"), 1, GL_FALSE,
+                           np.asarray(projection, dtype=np.float32))
+        glUniform1i(glGetUniformLocation(self.shader, "useSolidColor"), 0)
+
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glUniform1i(glGetUniformLocation(self.shader, "samplerTex"), 0)
+
+        glBindVertexArray(self.vao)
+        glDrawElementsInstanced(GL_TRIANGLES, len(self.indices), GL_UNSIGNED_INT, None, self.count)
+        glBindVertexArray(0)
+        glUseProgram(previous_program)
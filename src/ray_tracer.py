@@ -1,15 +1,21 @@
 import os
 import numpy as np
 from PIL import Image
-from tqdm import tqdm
 from camera.camera import CAMERA
-from ray_tracing.material import Material
-from ray_tracing.ray import ray_color
-from ray_tracing.scene import Scene
-from ray_tracing.sphere import Ring, Sphere
-from ray_tracing.texture import ImageTexture
-from scene_builder import PLANET_DATA, get_camera_config, calculate_planet_position, build_planet_dict
-from utils.generate_video import generate_video_from_frames
+from ray_tracing.adaptive import render_adaptive, sample_map
+from ray_tracing.binning import bin_objects
+from ray_tracing.environment import EnvironmentMap
+from ray_tracing.incremental import IncrementalRenderer
+from ray_tracing.jit import JIT_AVAILABLE
+from ray_tracing.parallel import render_frames, render_tiles
+from ray_tracing.profiling import profiler, save_heatmap
+from ray_tracing.progressive import render_progressive
+from ray_tracing.render import RenderSettings, render_rays
+from ray_tracing.texture_cache import texture_cache
+from ray_tracing.texture_store import texture_store
+from scene_builder import EPHEMERIS, get_camera_config
+from scene_graph import SceneGraph
+from utils.generate_video import VideoSink
 
 WIDTH = 800
 HEIGHT = 200
@@ -19,94 +25,210 @@ MAX_DEPTH = 3
 TIME_STEP = 0.1         
 TOTAL_FRAMES = 50       
 FRAME_IDX = 0       
+BACKEND = "scalar"      # "scalar" shades ray by ray with ray_color, "wavefront" shades whole chunks of rays,
+                        # "jit" is wavefront with numba compiled intersection kernels when numba is installed
+CHUNK_SIZE = 65536      # rays per chunk for the wavefront backend
+TEXTURE_BUDGET = 1024 * 1024 * 1024  # bytes of decoded textures kept between frames
+WORKERS = 1             # processes rendering tiles of a frame, 1 renders in this process
+TILE_SIZE = 32          # edge length of the tiles handed to the workers
+BINNING = True          # primary rays of a tile only test the objects projected onto that tile
+SEED = None             # fixes the sample jitter so renders are reproducible
+FRAME_WORKERS = 1       # processes rendering whole video frames in parallel, 1 renders them one by one
+SAVE_FRAMES = True      # also write every video frame as a PNG next to the encoded video
+VIDEO_FPS = 5
+VIDEO_CODEC = "libx264"
+ENV_MAP_SIZE = None     # (width, height) of the baked background for misses, e.g. (2048, 1024); None traces it per ray
+ASTEROID_COUNT = 0      # bodies in the asteroid belt between Mars and Jupiter, large belts are traced through a BVH
+ADAPTIVE = False         # spend samples where the pixel error is high instead of SAMPLES_PER_PIXEL everywhere
+MIN_SAMPLES = 4         # first batch of samples every pixel gets with adaptive sampling
+MAX_SAMPLES = 32        # upper bound of samples per pixel with adaptive sampling
+ADAPTIVE_BATCH = 4      # samples added per round to pixels that did not converge
+ADAPTIVE_THRESHOLD = 1.0  # standard error of the pixel luminance (0-255) below which a pixel is done
+SAVE_SAMPLE_MAP = True  # write the samples spent per pixel next to an adaptively rendered frame
+PROGRESSIVE_PASSES = 64  # passes of a resumable progressive render, each adds PROGRESSIVE_SAMPLES per pixel
+PROGRESSIVE_SAMPLES = 1
+CHECKPOINT_INTERVAL = 60.0  # seconds between checkpoints (and preview PNGs) of a progressive render
+CHECKPOINT_DIR = "checkpoints"
+INCREMENTAL = False     # video frames only re-trace the tiles that changed, with one jitter for the whole video
+PROFILE = False         # count and time the render stages of single frames, written to stats_XXXX.json
+PROFILE_HEATMAP = True  # with PROFILE and the scalar backend also write the per pixel cost map cost_XXXX.png
 
-def render_frame(time, frame_idx, output_dir, eye, target, up):
-    planets_dict = build_planet_dict()
-    camera = CAMERA(None, 
+# persistent scene graph of every asteroid count, see build_scene
+SCENE_GRAPHS = {}
+
+def build_scene(time, asteroids=ASTEROID_COUNT):
+    # the scene at time, one persistent scene graph per asteroid count only moves the bodies
+    # that changed since the last call, so the returned scene is updated in place by the next call
+    graph = SCENE_GRAPHS.get(asteroids)
+    if graph is None:
+        graph = SCENE_GRAPHS[asteroids] = SceneGraph(asteroids)
+    return graph.update(time)
+
+def render_settings(backend=BACKEND):
+    return RenderSettings(ambient=AMBIENT, max_depth=MAX_DEPTH, backend=backend, chunk_size=CHUNK_SIZE)
+
+def render_image(scene, camera, jitter, backend=BACKEND, workers=WORKERS, tile_size=TILE_SIZE, desc="Rendering",
+                 cost=None):
+    settings = render_settings(backend)
+    if workers > 1 or BINNING:
+        bins = bin_objects(scene, camera, tile_size) if BINNING else None
+        return render_tiles(scene, camera, jitter, settings, tile_size=tile_size, workers=workers, desc=desc,
+                            bins=bins, cost=cost)
+
+    # primary rays for every pixel and sample, generated in one batch
+    origins, directions = camera.get_rays(jitter)
+    return render_rays(scene, origins, directions, settings, desc=desc, cost=cost)
+
+def tonemap(image):
+    return (np.clip(image / 255, 0, 1) ** (1/2.2) * 255).astype(np.uint8)
+
+def make_camera(eye, target, up):
+    return CAMERA(None, 
                   camera_eye=eye, 
                   camera_target=target, 
                   camera_up=up, 
                   width=WIDTH, 
                   height=HEIGHT)
 
-    
-    spheres = []
-    rings = [] 
-    
-    for pdata in PLANET_DATA:
-        pos = calculate_planet_position(pdata, time, planets_dict)
-        name, radius, texture_path = pdata[0], pdata[1], pdata[2]
-        tex = ImageTexture(texture_path)
-        
-        if name == "Sun":
-            mat = Material(
-                tex,
-                emissive=True,
-                specular_strength=0.0,
-                shininess=0,
-                halo=True,
-                halo_size=8.0,
-                halo_strength=1.5
-            )
+def prepare_scene(time, eye):
+    scene = build_scene(time)
+    if ENV_MAP_SIZE:
+        scene.environment = EnvironmentMap(scene, eye, *ENV_MAP_SIZE)
+    return scene
+
+def render_pixels(time, eye, target, up, jitter, backend=BACKEND, workers=WORKERS, tile_size=TILE_SIZE, desc=None,
+                  cost=None):
+    scene = prepare_scene(time, eye)
+    image = render_image(scene, make_camera(eye, target, up), jitter,
+                         backend=backend, workers=workers, tile_size=tile_size, desc=desc, cost=cost)
+    return tonemap(image)
+
+def render_pixels_adaptive(time, eye, target, up, rng, backend=BACKEND, desc=None):
+    # adaptively sampled frame, returns the tonemapped image and the samples spent per pixel
+    scene = prepare_scene(time, eye)
+    acc = render_adaptive(scene, make_camera(eye, target, up), render_settings(backend), rng,
+                          min_samples=MIN_SAMPLES, max_samples=MAX_SAMPLES, batch=ADAPTIVE_BATCH,
+                          threshold=ADAPTIVE_THRESHOLD, desc=desc)
+    return tonemap(acc.mean()), acc.count
+
+def render_frame(time, frame_idx, output_dir, eye, target, up, backend=BACKEND, workers=WORKERS, tile_size=TILE_SIZE):
+    if PROFILE:
+        return render_frame_profiled(time, frame_idx, output_dir, eye, target, up, backend=backend,
+                                     tile_size=tile_size)
+    if ADAPTIVE:
+        image, count = render_pixels_adaptive(time, eye, target, up, np.random.default_rng(SEED), backend=backend,
+                                              desc=f"Rendering frame {frame_idx}")
+        save_frame(image, frame_idx, output_dir)
+        print(f"Average samples per pixel: {count.mean():.2f}")
+        if SAVE_SAMPLE_MAP:
+            Image.fromarray(sample_map(count, MAX_SAMPLES)).save(f"{output_dir}/samples_{frame_idx:04d}.png")
+        return
+
+    # seeded on its own like the video frames, so a single frame is reproducible
+    jitter = np.random.default_rng(SEED).random((HEIGHT, WIDTH, SAMPLES_PER_PIXEL, 2))
+    image = render_pixels(time, eye, target, up, jitter, backend=backend, workers=workers, tile_size=tile_size,
+                          desc=f"Rendering frame {frame_idx}")
+    save_frame(image, frame_idx, output_dir)
+
+def render_frame_profiled(time, frame_idx, output_dir, eye, target, up, backend=BACKEND, tile_size=TILE_SIZE):
+    # render_frame with every stage counted and timed, the tiles render in this process so the
+    # profiler sees all of them, the time outside every other stage is booked as shading
+    cost = np.zeros((HEIGHT, WIDTH)) if PROFILE_HEATMAP and backend == "scalar" and not ADAPTIVE else None
+    profiler.reset()
+    with profiler.active(), profiler.stage("shading"):
+        if ADAPTIVE:
+            image, _ = render_pixels_adaptive(time, eye, target, up, np.random.default_rng(SEED), backend=backend,
+                                              desc=f"Rendering frame {frame_idx}")
         else:
-            mat = Material(
-                tex,
-                emissive=(name == "Sun"),
-                specular_strength=0.4,
-                shininess=64
-            )
-        spheres.append(Sphere(pos, radius, mat))
-        
-        if name == "Saturn":
-            ring_texture = ImageTexture("assets/texture/planets/saturn/saturn ring.png")
-            ring_mat = Material(
-                ring_texture,
-                emissive=False,
-                specular_strength=0.2,
-                shininess=32
-            )
-            rings.append(Ring(
-                center=pos,
-                inner_radius=radius * 1.5,
-                outer_radius=radius * 2.5,
-                material=ring_mat
-            ))
-
-    # texture for the background
-    sky_texture = ImageTexture("assets/texture/space.png")
-    
-    # light source : sun
-    light_sphere = next(s for s in spheres if s.material.emissive)
-    
-    # scene creation with rings
-    scene = Scene(spheres, light_sphere, rings=rings, background_texture=sky_texture)
-
-    # initializing the image buffer
-    image = np.zeros((HEIGHT, WIDTH, 3), dtype=np.float32)
-    
-    # render loop
-    for y in tqdm(range(HEIGHT), desc=f"Rendering frame {frame_idx}", leave=False):
-        for x in range(WIDTH):
-            color = np.zeros(3, dtype=np.float32)
-            for _ in range(SAMPLES_PER_PIXEL):
-                dx, dy = np.random.rand(2)
-                ro, rd = camera.get_ray(x, y, dx, dy)
-                # calculating pixel color
-                color += ray_color(ro, rd, scene, AMBIENT, MAX_DEPTH, 0)
-                
-            # averaging over all samples
-            image[y, x] = color / SAMPLES_PER_PIXEL
-    image = (np.clip(image / 255, 0, 1) ** (1/2.2) * 255).astype(np.uint8)
-    
+            jitter = np.random.default_rng(SEED).random((HEIGHT, WIDTH, SAMPLES_PER_PIXEL, 2))
+            image = render_pixels(time, eye, target, up, jitter, backend=backend, workers=1, tile_size=tile_size,
+                                  desc=f"Rendering frame {frame_idx}", cost=cost)
+        with profiler.stage("png_save"):
+            save_frame(image, frame_idx, output_dir)
+
+    stats_path = f"{output_dir}/stats_{frame_idx:04d}.json"
+    profiler.save(stats_path, frame=frame_idx, time=float(time), backend=backend, width=WIDTH, height=HEIGHT,
+                  samples_per_pixel=SAMPLES_PER_PIXEL, adaptive=ADAPTIVE)
+    print(f"Saved render statistics to {stats_path}")
+    if cost is not None:
+        save_heatmap(cost, f"{output_dir}/cost_{frame_idx:04d}.png")
+
+def render_frame_progressive(time, frame_idx, output_dir, eye, target, up, backend=BACKEND):
+    # resumable render, progress is checkpointed and a rerun continues where the last one stopped
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    checkpoint_path = os.path.join(CHECKPOINT_DIR, f"frame_{frame_idx:04d}.npz")
+    preview_path = f"{output_dir}/preview_{frame_idx:04d}.png"
+
+    def preview(acc):
+        # written next to the final frame and replaced atomically, so it can be viewed at any time
+        Image.fromarray(tonemap(acc.mean())).save(preview_path + ".tmp", format="PNG")
+        os.replace(preview_path + ".tmp", preview_path)
+
+    meta = {
+        "time": float(time),
+        "eye": np.asarray(eye, dtype=float).tolist(),
+        "target": np.asarray(target, dtype=float).tolist(),
+        "up": np.asarray(up, dtype=float).tolist(),
+        "asteroids": ASTEROID_COUNT,
+        "ambient": AMBIENT,
+    }
+    acc = render_progressive(prepare_scene(time, eye), make_camera(eye, target, up), render_settings(backend),
+                             PROGRESSIVE_PASSES, checkpoint_path, samples_per_pass=PROGRESSIVE_SAMPLES,
+                             seed=SEED or 0, checkpoint_interval=CHECKPOINT_INTERVAL, preview=preview, meta=meta,
+                             desc=f"Refining frame {frame_idx}")
+    save_frame(tonemap(acc.mean()), frame_idx, output_dir)
+    print(f"Samples per pixel: {acc.count.min()}, checkpoint: {checkpoint_path}")
+
+def save_frame(image, frame_idx, output_dir):
     filename = f"{output_dir}/frame_{frame_idx:04d}.png"
     Image.fromarray(image).save(filename)
     print(f"Saved frame {frame_idx} to {filename}")
 
+def render_video_frame(time, eye, target, up, seed, backend=BACKEND):
+    # one frame of a frame parallel video, the jitter comes from a per frame seed
+    # so the result does not depend on which process renders it
+    if ADAPTIVE:
+        return render_pixels_adaptive(time, eye, target, up, np.random.default_rng(seed), backend=backend)[0]
+    jitter = np.random.default_rng(seed).random((HEIGHT, WIDTH, SAMPLES_PER_PIXEL, 2))
+    return render_pixels(time, eye, target, up, jitter, backend=backend, workers=1)
+
+def render_video(config_time, eye, target, up, consume, frame_workers=FRAME_WORKERS):
+    # renders TOTAL_FRAMES frames and calls consume(i, frame) in frame order as soon as each one is done
+    seeds = np.random.SeedSequence(SEED).spawn(TOTAL_FRAMES)
+    # the body positions of all frames in one vectorized call, build_scene picks its row
+    EPHEMERIS.positions(config_time + np.arange(TOTAL_FRAMES) * TIME_STEP)
+    if INCREMENTAL:
+        # the camera is fixed, so tiles no body moved through are copied from the previous frame
+        jitter = np.random.default_rng(SEED).random((HEIGHT, WIDTH, SAMPLES_PER_PIXEL, 2))
+        renderer = IncrementalRenderer(make_camera(eye, target, up), jitter, render_settings(), TILE_SIZE)
+        for i in range(TOTAL_FRAMES):
+            consume(i, tonemap(renderer.render(prepare_scene(config_time + i * TIME_STEP, eye))))
+            print(f"Frame {i}: re-rendered {renderer.rendered} of {len(renderer.tiles)} tiles")
+        return
+
+    if frame_workers <= 1:
+        for i in range(TOTAL_FRAMES):
+            current_time = config_time + i * TIME_STEP
+            # per frame seeds as in the frame parallel path, so both give the same video
+            if ADAPTIVE:
+                image = render_pixels_adaptive(current_time, eye, target, up, np.random.default_rng(seeds[i]),
+                                               desc=f"Rendering frame {i}")[0]
+                consume(i, image)
+                continue
+            jitter = np.random.default_rng(seeds[i]).random((HEIGHT, WIDTH, SAMPLES_PER_PIXEL, 2))
+            consume(i, render_pixels(current_time, eye, target, up, jitter, desc=f"Rendering frame {i}"))
+        return
+
+    frame_args = [(config_time + i * TIME_STEP, eye, target, up, seeds[i]) for i in range(TOTAL_FRAMES)]
+    render_frames(render_video_frame, frame_args, (HEIGHT, WIDTH, 3), consume, workers=frame_workers)
+
 def main():
     print("Ray Tracing Solar System")
     print("1. Render a single frame")
     print("2. Render a full video")
-    choice = input("Enter choice [1-2]: ").strip()
+    print("3. Pre-decode textures for fast startup")
+    print("4. Progressive render of a single frame (resumable)")
+    choice = input("Enter choice [1-4]: ").strip()
 
     output_dir = "frames"
     video_dir = "video"
@@ -117,19 +239,35 @@ def main():
     os.makedirs(video_dir, exist_ok=True)
 
     config_time, eye, target, up = get_camera_config()
+    texture_cache.budget_bytes = TEXTURE_BUDGET
+    if BACKEND == "jit" and not JIT_AVAILABLE:
+        print("numba is not installed, the jit backend runs the NumPy kernels")
 
     if choice == "1":
         render_frame(config_time, FRAME_IDX, output_dir, eye, target, up)
 
     elif choice == "2":
-        for i in range(TOTAL_FRAMES):
-            current_time = config_time + i * TIME_STEP
-            render_frame(current_time, i, output_dir, eye, target, up)
-        generate_video_from_frames(output_dir, video_path)
+        # frames are encoded while the next ones render, PNG copies are optional
+        frames_dir = output_dir if SAVE_FRAMES else None
+        with VideoSink(video_path, fps=VIDEO_FPS, codec=VIDEO_CODEC, frames_dir=frames_dir) as sink:
+            def consume(i, frame):
+                sink.append(frame)
+                print(f"Encoded frame {i}")
+            render_video(config_time, eye, target, up, consume)
         print(f"Video saved to: {video_path}")
+        stats = texture_cache.stats()
+        print(f"Texture cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions")
+
+    elif choice == "3":
+        results = texture_store.bake_all()
+        baked = sum(1 for status in results.values() if status == "baked")
+        print(f"Baked {baked} textures, {len(results) - baked} already up to date in {texture_store.store_dir}")
+
+    elif choice == "4":
+        render_frame_progressive(config_time, FRAME_IDX, output_dir, eye, target, up)
 
     else:
-        print("Invalid choice. Please enter 1 or 2.")
+        print("Invalid choice. Please enter 1, 2, 3 or 4.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,122 @@
+import json
+import os
+
+import numpy as np
+from tqdm import tqdm
+
+from ray_tracing.render import render_rays
+
+# adaptive supersampling
+# every pixel starts with a small batch of samples, then rounds of extra samples only go to the
+# pixels whose estimated error is still above a threshold, until they converge or hit max_samples
+# the error is the standard error of the mean luminance of the pixel in 0-255 units
+
+LUMA = np.array([0.2126, 0.7152, 0.0722])
+
+
+class SampleAccumulator:
+    """running per pixel sums of the sample colors, of the squared luminance and the sample counts"""
+    def __init__(self, height, width):
+        self.sum = np.zeros((height, width, 3))
+        self.sum_sq = np.zeros((height, width))
+        self.count = np.zeros((height, width), dtype=np.int32)
+
+    @property
+    def shape(self):
+        return self.count.shape
+
+    def add(self, ys, xs, colors):
+        # colors is (P, S, 3), S new samples for each of the P pixels (ys, xs), pixels must be unique
+        luma = colors @ LUMA
+        self.sum[ys, xs] += colors.sum(axis=1)
+        self.sum_sq[ys, xs] += (luma * luma).sum(axis=1)
+        self.count[ys, xs] += colors.shape[1]
+
+    def mean(self):
+        # (H, W, 3) float32 image, black where a pixel has no samples yet
+        count = np.maximum(self.count, 1)[..., None]
+        return (self.sum / count).astype(np.float32)
+
+    def save(self, path, **meta):
+        # atomic checkpoint, a crash while writing leaves the previous checkpoint intact
+        # meta is stored as json and must match when the checkpoint is loaded again
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, sum=self.sum, sum_sq=self.sum_sq, count=self.count, meta=json.dumps(meta, sort_keys=True))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **meta):
+        # accumulator saved by save, raises ValueError when it was saved with other meta data
+        with np.load(path) as data:
+            saved = json.loads(str(data["meta"]))
+            if saved != json.loads(json.dumps(meta, sort_keys=True)):
+                raise ValueError(f"checkpoint {path} belongs to another render: {saved}")
+            acc = cls(*data["count"].shape)
+            acc.sum[:] = data["sum"]
+            acc.sum_sq[:] = data["sum_sq"]
+            acc.count[:] = data["count"]
+        return acc
+
+    def error(self):
+        # standard error of the mean luminance, inf for pixels with fewer than two samples
+        n = self.count.astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = (self.sum @ LUMA) / n
+            variance = np.maximum(self.sum_sq / n - mean * mean, 0.0) * n / (n - 1)
+            error = np.sqrt(variance / n)
+        return np.where(n > 1, error, np.inf)
+
+
+def grow(mask):
+    # mask plus its 4-neighbourhood, edges that the first samples missed sit next to noisy pixels
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown
+
+
+def sample_map(count, max_samples):
+    # (H, W) uint8 debug image of the samples spent per pixel, white is max_samples
+    return (np.clip(count / max_samples, 0.0, 1.0) * 255).astype(np.uint8)
+
+
+def render_adaptive(scene, camera, settings, rng, min_samples=4, max_samples=32, batch=4, threshold=1.0,
+                    desc=None):
+    """
+    render the frame with a per pixel sample count driven by the estimated error
+    parameters:
+    - rng: numpy Generator for the sub-pixel offsets
+    - min_samples: samples every pixel gets in the first round, at least 2 to estimate the variance
+    - max_samples: upper bound of samples per pixel
+    - batch: samples added per round to the pixels that did not converge
+    - threshold: standard error of the mean luminance (0-255) below which a pixel counts as converged
+    returns the SampleAccumulator, mean() is the image and count the sample count map
+    """
+    if min_samples < 2:
+        raise ValueError("min_samples must be at least 2 to estimate the variance")
+    height, width = camera.height, camera.width
+    acc = SampleAccumulator(height, width)
+    ys, xs = np.indices((height, width)).reshape(2, -1)
+    samples = np.full(len(ys), min(min_samples, max_samples))
+
+    with tqdm(desc=desc, leave=False, disable=desc is None, unit=" rounds") as progress:
+        while len(ys):
+            # pixels close to max_samples get a smaller last batch
+            for n in np.unique(samples):
+                sel = samples == n
+                jitter = rng.random((int(sel.sum()), n, 2))
+                origins, directions = camera.get_pixel_rays(ys[sel], xs[sel], jitter)
+                # every sample as its own (1 x 1 sample) pixel gives the unaveraged colors
+                colors = render_rays(scene, origins[:, :, None], directions[:, :, None], settings)
+                acc.add(ys[sel], xs[sel], colors)
+
+            open_pixels = acc.count < max_samples
+            active = grow(acc.error() > threshold) & open_pixels
+            ys, xs = np.nonzero(active)
+            samples = np.minimum(batch, max_samples - acc.count[ys, xs])
+            progress.update()
+            progress.set_postfix(active=len(ys))
+    return acc
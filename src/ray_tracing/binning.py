@@ -0,0 +1,30 @@
+import numpy as np
+
+from ray_tracing.parallel import frame_tiles
+
+# screen space binning of the objects for primary rays
+# the bounding sphere of every object is projected onto the image with CAMERA.project_spheres and
+# every tile of the frame_tiles grid gets the list of objects whose window overlaps it
+# objects outside of the frame or behind the camera have an empty window and are in no list, rings
+# are projected through their bounding sphere (outer radius) and culled the same way
+# primary rays of a tile then only test those candidates, a tile without candidates is all background
+
+
+def bin_objects(scene, camera, tile_size):
+    """
+    candidate object indices for every tile of frame_tiles(camera.height, camera.width, tile_size)
+    returns a dict mapping the (y0, y1, x0, x1) tile to a sorted intp array of object indices
+    """
+    tiles = frame_tiles(camera.height, camera.width, tile_size)
+    columns = -(-camera.width // tile_size)
+    bins = [[] for _ in tiles]
+
+    centers, radii = scene.bounding_spheres()
+    windows = camera.project_spheres(centers, radii)
+    visible = (windows[:, 0] < windows[:, 1]) & (windows[:, 2] < windows[:, 3])
+    for i in np.nonzero(visible)[0]:
+        y0, y1, x0, x1 = windows[i]
+        for row in range(y0 // tile_size, (y1 - 1) // tile_size + 1):
+            for col in range(x0 // tile_size, (x1 - 1) // tile_size + 1):
+                bins[row * columns + col].append(i)
+    return {tile: np.array(found, dtype=np.intp) for tile, found in zip(tiles, bins)}
@@ -0,0 +1,228 @@
+import numpy as np
+
+# bounding volume hierarchy over the axis aligned boxes of the scene objects
+# nodes are stored in flat arrays in depth first order, a leaf covers the range
+# order[start:start + count] of object indices and an inner node has two children
+# the objects themselves are tested by callbacks, so the tree only knows boxes and indices
+
+LEAF_SIZE = 4
+# boxes are grown by this amount relative to their size and position so rounding in the
+# object tests can never produce a hit just outside of its box
+BOX_PADDING = 1e-6
+
+
+def _safe_inverse(dirs):
+    # 1 / d without infinities, a tiny component still gives a huge slope but no nan from 0 * inf
+    dirs = np.asarray(dirs, dtype=np.float64)
+    tiny = np.where(dirs < 0, -1e-300, 1e-300)
+    return 1.0 / np.where(np.abs(dirs) < 1e-300, tiny, dirs)
+
+
+class BVH:
+    def __init__(self, lower, upper, leaf_size=LEAF_SIZE):
+        """
+        parameters:
+        - lower, upper: (M, 3) corners of the object boxes, the object index is the row
+        - leaf_size: maximum number of objects per leaf
+        """
+        self.leaf_size = leaf_size
+        lower = np.asarray(lower, dtype=np.float64).reshape(-1, 3)
+        upper = np.asarray(upper, dtype=np.float64).reshape(-1, 3)
+        self.count = len(lower)
+        self.order = np.arange(self.count)
+        self.left, self.right, self.start, self.size = [], [], [], []
+        if self.count:
+            self._build((lower + upper) * 0.5, 0, self.count)
+        self.left = np.array(self.left, dtype=np.intp)
+        self.right = np.array(self.right, dtype=np.intp)
+        self.start = np.array(self.start, dtype=np.intp)
+        self.size = np.array(self.size, dtype=np.intp)
+        self.refit(lower, upper)
+
+    def _build(self, centroids, start, stop):
+        node = len(self.left)
+        for field in (self.left, self.right, self.start, self.size):
+            field.append(-1)
+        items = self.order[start:stop]
+        if stop - start <= self.leaf_size:
+            self.start[node] = start
+            self.size[node] = stop - start
+            return node
+
+        # median split along the axis where the centroids spread the most
+        extent = centroids[items].max(axis=0) - centroids[items].min(axis=0)
+        axis = int(np.argmax(extent))
+        self.order[start:stop] = items[np.argsort(centroids[items, axis], kind="stable")]
+        mid = (start + stop) // 2
+        self.left[node] = self._build(centroids, start, mid)
+        self.right[node] = self._build(centroids, mid, stop)
+        return node
+
+    def refit(self, lower, upper):
+        # recompute the node boxes for moved objects while keeping the tree topology
+        # children always come after their parent, so walking the nodes backwards is bottom up
+        lower = np.asarray(lower, dtype=np.float64).reshape(-1, 3)
+        upper = np.asarray(upper, dtype=np.float64).reshape(-1, 3)
+        pad = (upper - lower + np.abs(lower) + np.abs(upper)) * BOX_PADDING + BOX_PADDING
+        lower = lower - pad
+        upper = upper + pad
+        nodes = len(self.left)
+        self.node_lower = np.empty((nodes, 3))
+        self.node_upper = np.empty((nodes, 3))
+        for node in range(nodes - 1, -1, -1):
+            if self.left[node] < 0:
+                items = self.order[self.start[node]:self.start[node] + self.size[node]]
+                self.node_lower[node] = lower[items].min(axis=0)
+                self.node_upper[node] = upper[items].max(axis=0)
+            else:
+                a, b = self.left[node], self.right[node]
+                self.node_lower[node] = np.minimum(self.node_lower[a], self.node_lower[b])
+                self.node_upper[node] = np.maximum(self.node_upper[a], self.node_upper[b])
+        # plain python copies for the scalar traversal, indexing numpy arrays per node is slow
+        self._lower_list = self.node_lower.tolist()
+        self._upper_list = self.node_upper.tolist()
+        self._leaf_items = [
+            self.order[self.start[n]:self.start[n] + self.size[n]].tolist() if self.left[n] < 0 else None
+            for n in range(nodes)
+        ]
+
+    def leaves(self):
+        return int(np.sum(self.left < 0))
+
+    def surface_area(self):
+        # summed surface of the node boxes, the expected traversal cost grows with it
+        size = self.node_upper - self.node_lower
+        return float(2 * np.sum(size[:, 0] * size[:, 1] + size[:, 1] * size[:, 2] + size[:, 2] * size[:, 0]))
+
+    # scalar traversal
+
+    def _enters(self, node, origin, inv, t_max):
+        lo = self._lower_list[node]
+        hi = self._upper_list[node]
+        t_near, t_far = -np.inf, np.inf
+        for axis in range(3):
+            t1 = (lo[axis] - origin[axis]) * inv[axis]
+            t2 = (hi[axis] - origin[axis]) * inv[axis]
+            if t1 > t2:
+                t1, t2 = t2, t1
+            if t1 > t_near:
+                t_near = t1
+            if t2 < t_far:
+                t_far = t2
+        return t_near <= t_far and t_far >= 0.0 and t_near <= t_max
+
+    def closest(self, origin, direction, distance_fn):
+        """
+        closest hit (t, index) of one ray, (inf, -1) on a miss
+        distance_fn(i) returns the hit distance of object i or None
+        ties on t go to the lowest object index, like a linear scan in index order
+        """
+        if not self.count:
+            return np.inf, -1
+        origin = [float(x) for x in origin]
+        inv = _safe_inverse(direction).tolist()
+        best_t, best_i = np.inf, -1
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if not self._enters(node, origin, inv, best_t):
+                continue
+            items = self._leaf_items[node]
+            if items is None:
+                stack.append(self.right[node])
+                stack.append(self.left[node])
+                continue
+            for i in items:
+                t = distance_fn(i)
+                if t is not None and (t < best_t or (t == best_t and i < best_i)):
+                    best_t, best_i = t, i
+        return best_t, best_i
+
+    def any(self, origin, direction, t_max, test_fn):
+        # any hit of one ray, test_fn(i) tells whether object i blocks it, stops at the first one
+        if not self.count:
+            return False
+        origin = [float(x) for x in origin]
+        inv = _safe_inverse(direction).tolist()
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            if not self._enters(node, origin, inv, t_max):
+                continue
+            items = self._leaf_items[node]
+            if items is None:
+                stack.append(self.right[node])
+                stack.append(self.left[node])
+                continue
+            for i in items:
+                if test_fn(i):
+                    return True
+        return False
+
+    # packet traversal, every node is tested against all rays of the packet that reached it
+
+    def _packet_enters(self, node, origins, inv, rows, t_max):
+        t1 = (self.node_lower[node] - origins[rows]) * inv[rows]
+        t2 = (self.node_upper[node] - origins[rows]) * inv[rows]
+        t_near = np.max(np.minimum(t1, t2), axis=1)
+        t_far = np.min(np.maximum(t1, t2), axis=1)
+        return rows[(t_near <= t_far) & (t_far >= 0.0) & (t_near <= t_max[rows])]
+
+    def closest_many(self, origins, dirs, leaf_fn):
+        """
+        closest hits of N rays, leaf_fn(items, rows) returns the (len(rows), len(items)) hit distances
+        of those rays against those objects with inf for misses
+        returns (t, index) arrays with inf / -1 where a ray misses everything
+        """
+        n = len(dirs)
+        best_t = np.full(n, np.inf)
+        best_i = np.full(n, -1, dtype=np.intp)
+        if not self.count or not n:
+            return best_t, best_i
+        inv = _safe_inverse(dirs)
+        stack = [(0, np.arange(n))]
+        while stack:
+            node, rows = stack.pop()
+            rows = self._packet_enters(node, origins, inv, rows, best_t)
+            if not len(rows):
+                continue
+            if self.left[node] >= 0:
+                stack.append((self.right[node], rows))
+                stack.append((self.left[node], rows))
+                continue
+            items = self.order[self.start[node]:self.start[node] + self.size[node]]
+            t = leaf_fn(items, rows)
+            for k, i in enumerate(items):
+                tk = t[:, k]
+                better = (tk < best_t[rows]) | ((tk == best_t[rows]) & (i < best_i[rows]) & np.isfinite(tk))
+                best_t[rows[better]] = tk[better]
+                best_i[rows[better]] = i
+        return best_t, best_i
+
+    def any_many(self, origins, dirs, t_max, leaf_fn):
+        """
+        any hits of N rays, leaf_fn(items, rows) returns a (len(rows),) bool array telling which of
+        those rays are blocked by one of those objects, rays leave the traversal once blocked
+        """
+        n = len(dirs)
+        blocked = np.zeros(n, dtype=bool)
+        if not self.count or not n:
+            return blocked
+        inv = _safe_inverse(dirs)
+        # blocked rays get a negative range so the box test drops them from every later node
+        limit = np.array(t_max, dtype=np.float64)
+        stack = [(0, np.arange(n))]
+        while stack:
+            node, rows = stack.pop()
+            rows = self._packet_enters(node, origins, inv, rows, limit)
+            if not len(rows):
+                continue
+            if self.left[node] >= 0:
+                stack.append((self.right[node], rows))
+                stack.append((self.left[node], rows))
+                continue
+            items = self.order[self.start[node]:self.start[node] + self.size[node]]
+            hit = leaf_fn(items, rows)
+            blocked[rows[hit]] = True
+            limit[rows[hit]] = -np.inf
+        return blocked
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from ray_tracing.texture import ImageTexture
+from ray_tracing.vectors import get_sphere_uv_many, normalize_many
+from ray_tracing.wavefront import background_corona, background_nebula
+
+# baked background for rays that miss every object
+# the nebula, the background texture and the sun corona only depend on the ray direction and on the
+# eye to sun geometry, so they are evaluated once per texel of an equirectangular map laid out like
+# get_sphere_uv and misses just sample that map
+# the nebula part does not depend on the eye at all and is shared by every frame
+
+# baked layers kept between frames, the oldest ones are dropped first
+CACHE_ENTRIES = 4
+_nebula_cache = OrderedDict()
+_corona_cache = OrderedDict()
+
+
+def map_directions(width, height):
+    # unit direction of every texel, texel (i, j) sits at u = j / (w - 1), v = i / (h - 1)
+    # which is where ImageTexture.value_many looks up (u, v)
+    u = np.linspace(0.0, 1.0, width)
+    v = np.linspace(0.0, 1.0, height)
+    phi = (u - 0.5) * 2 * np.pi
+    lat = (0.5 - v) * np.pi
+    x = np.cos(lat)[:, None] * np.cos(phi)[None, :]
+    y = np.repeat(np.sin(lat)[:, None], width, axis=1)
+    z = np.cos(lat)[:, None] * np.sin(phi)[None, :]
+    return np.stack([x, y, z], axis=-1).reshape(-1, 3)
+
+
+def _cached(cache, key, build):
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    value = cache[key] = build()
+    while len(cache) > CACHE_ENTRIES:
+        cache.popitem(last=False)
+    return value
+
+
+class EnvironmentMap:
+    def __init__(self, scene, eye, width=2048, height=1024, filter="bilinear"):
+        """
+        parameters:
+        - scene: scene whose background texture and sun are baked
+        - eye: origin of the rays that will sample the map, the corona is only right for this point
+        - width, height: resolution of the equirectangular map
+        - filter: texture filter used when sampling the map
+        """
+        self.width = width
+        self.height = height
+        background = scene.background_texture
+        background_key = getattr(background, "path", id(background))
+        sun = scene.light
+        eye = np.asarray(eye, dtype=np.float64)
+
+        nebula = _cached(_nebula_cache, (background_key, width, height),
+                         lambda: self._bake_nebula(background))
+        corona = _cached(_corona_cache, (tuple(eye), tuple(sun.center), sun.radius, width, height),
+                         lambda: self._bake_corona(eye, sun))
+        image = nebula.copy()
+        if corona is not None:
+            rows, colors = corona
+            image[rows] += colors
+        np.clip(image, 0.0, 255.0, out=image)
+        self.texture = ImageTexture.from_array(image.reshape(height, width, 3), filter=filter)
+
+    def _bake_nebula(self, background):
+        dirs = map_directions(self.width, self.height)
+        return background_nebula(dirs, background).astype(np.float32)
+
+    def _bake_corona(self, eye, sun):
+        # the corona only covers a small cone around the sun, only the texels inside it are stored
+        dirs = map_directions(self.width, self.height)
+        corona = background_corona(np.broadcast_to(eye, dirs.shape), dirs, sun)
+        rows = np.nonzero(np.any(corona != 0.0, axis=1))[0]
+        if not len(rows):
+            return None
+        return rows, corona[rows].astype(np.float32)
+
+    def sample(self, dirs):
+        u, v = get_sphere_uv_many(normalize_many(np.asarray(dirs, dtype=np.float64)))
+        return self.texture.value_many(u, v)
@@ -0,0 +1,143 @@
+import numpy as np
+
+from ray_tracing.parallel import frame_tiles, render_tile
+from ray_tracing.sphere import shadow_casters
+
+# incremental re-rendering for a fixed camera
+# between two frames only the objects that moved change the image: the pixels they covered before
+# and after, and the pixels of the objects they shadow (or stopped shadowing)
+# the frame is rendered in tiles with a jitter that stays the same for every frame, so a tile that
+# is not dirty renders to exactly the same values and is copied from the previous frame
+
+
+def _geometry(scene):
+    # everything about the objects a primary or shadow ray depends on, one row per object
+    spheres = np.zeros((len(scene.spheres), 8))
+    spheres[:, :3] = scene.sphere_centers
+    spheres[:, 3] = scene.sphere_radii
+    rings = np.column_stack([scene.ring_centers, scene.ring_inner, scene.ring_outer, scene.ring_normals])
+    return np.concatenate([spheres, rings.reshape(-1, 8)])
+
+
+class SceneState:
+    # copy of the geometry of a scene at one frame, a scene moved in place (see scene_graph.SceneGraph)
+    # would otherwise compare equal to itself
+    def __init__(self, scene):
+        self.counts = (len(scene.spheres), len(scene.rings))
+        self.light_center = np.array(scene.light.center)
+        self.light_radius = scene.light.radius
+        self.geometry = _geometry(scene)
+        centers, radii = scene.bounding_spheres()
+        self.centers = np.array(centers)
+        self.radii = np.array(radii)
+
+
+def changed_objects(previous, scene):
+    # indices of the objects that moved or changed shape, None when the scenes are not comparable
+    # previous is a SceneState or a Scene
+    if not isinstance(previous, SceneState):
+        previous = SceneState(previous)
+    if previous.counts != (len(scene.spheres), len(scene.rings)):
+        return None
+    if not np.array_equal(previous.light_center, scene.light.center) or previous.light_radius != scene.light.radius:
+        return None
+    return np.nonzero(np.any(previous.geometry != _geometry(scene), axis=1))[0]
+
+
+def dirty_regions(previous, scene, camera):
+    """
+    pixel windows (y0, y1, x0, x1) that can differ between renders of previous and scene
+    with the same camera, a single full frame window when the scenes are not comparable
+    previous is a SceneState or a Scene
+    """
+    if not isinstance(previous, SceneState):
+        previous = SceneState(previous)
+    full = [(0, camera.height, 0, camera.width)]
+    moved = changed_objects(previous, scene)
+    if moved is None:
+        return full
+
+    old_centers, old_radii = previous.centers, previous.radii
+    centers, radii = scene.bounding_spheres()
+    regions = []
+    for i in moved:
+        regions.append(camera.project_sphere(old_centers[i], old_radii[i]))
+        regions.append(camera.project_sphere(centers[i], radii[i]))
+
+    # shadow influence: every object a moved sphere can shadow before or after the move
+    n_spheres = len(scene.spheres)
+    movers = [i for i in moved if i < n_spheres and not scene.spheres[i].material.emissive]
+    if movers:
+        occluders = (np.concatenate([old_centers[movers], centers[movers]]),
+                     np.concatenate([old_radii[movers], radii[movers]]))
+        receivers = list(zip(centers, radii))
+        for i, found in enumerate(shadow_casters(receivers, occluders, scene.light.center)):
+            if len(found):
+                regions.append(camera.project_sphere(centers[i], radii[i]))
+
+    # objects outside of the frame or behind the camera have no window
+    return [r for r in regions if r is not None]
+
+
+def dirty_tiles(tiles, regions):
+    # bool mask of the tiles overlapping any of the regions
+    dirty = np.zeros(len(tiles), dtype=bool)
+    for y0, y1, x0, x1 in regions:
+        for k, (ty0, ty1, tx0, tx1) in enumerate(tiles):
+            if ty0 < y1 and y0 < ty1 and tx0 < x1 and x0 < tx1:
+                dirty[k] = True
+    return dirty
+
+
+class IncrementalRenderer:
+    def __init__(self, camera, jitter, settings, tile_size=32):
+        """
+        parameters:
+        - camera: fixed camera of all frames
+        - jitter: (H, W, S, 2) sub-pixel offsets used for every frame, see CAMERA.get_rays
+        - settings: RenderSettings of the frames
+        - tile_size: edge length of the tiles that are re-rendered or copied
+        """
+        self.camera = camera
+        self.jitter = jitter
+        self.settings = settings
+        self.tiles = frame_tiles(camera.height, camera.width, tile_size)
+        self.previous = None
+        self.image = None
+        # tiles re-rendered for the last frame, for statistics
+        self.rendered = 0
+
+    def render(self, scene):
+        # (H, W, 3) image of scene, only the tiles that changed since the previous call are traced
+        if self.previous is None:
+            dirty = np.ones(len(self.tiles), dtype=bool)
+            self.image = np.zeros((self.camera.height, self.camera.width, 3), dtype=np.float32)
+        else:
+            dirty = dirty_tiles(self.tiles, dirty_regions(self.previous, scene, self.camera))
+
+        for k in np.nonzero(dirty)[0]:
+            y0, y1, x0, x1 = tile = self.tiles[k]
+            self.image[y0:y1, x0:x1] = render_tile(scene, self.camera, self.jitter, tile, self.settings)
+        self.previous = SceneState(scene)
+        self.rendered = int(dirty.sum())
+        return self.image.copy()
+
+
+def verify_incremental(scenes, camera, jitter, settings, tile_size=32):
+    """
+    render the scenes incrementally and each of them in full and check that both agree bit for bit
+    scenes can also be one scene that the iterable moves in place between frames
+    returns the number of re-rendered tiles per frame, raises AssertionError on the first difference
+    """
+    renderer = IncrementalRenderer(camera, jitter, settings, tile_size)
+    rendered = []
+    for i, scene in enumerate(scenes):
+        image = renderer.render(scene)
+        full = np.zeros_like(image)
+        for y0, y1, x0, x1 in renderer.tiles:
+            full[y0:y1, x0:x1] = render_tile(scene, camera, jitter, (y0, y1, x0, x1), settings)
+        if not np.array_equal(image, full):
+            diff = np.argwhere(np.any(image != full, axis=-1))
+            raise AssertionError(f"frame {i}: {len(diff)} pixels differ from a full render, first at {diff[0]}")
+        rendered.append(renderer.rendered)
+    return rendered
@@ -0,0 +1,232 @@
+import math
+
+import numpy as np
+
+from ray_tracing.scene import BVH_MIN_OBJECTS
+from ray_tracing.sphere import PacketHit
+
+try:
+    import numba
+except ImportError:  # the jit backend then runs the NumPy packet kernels of Scene
+    numba = None
+
+# compiled kernels for the interpreter bound parts of the scalar path
+# closest hit, shadow any hit and the hit surface (point, normal, sphere / ring uv) are plain loops
+# over the rays, with numba they are compiled in nopython mode, run in parallel over the rays and
+# cached on disk (__pycache__ next to this file) so only the first run pays for the compilation
+# the arithmetic follows Sphere.hit, Sphere.occludes, Ring.hit and get_sphere_uv step by step
+
+JIT_AVAILABLE = numba is not None
+
+if numba is not None:
+    prange = numba.prange
+
+    def _kernel(fn):
+        return numba.njit(parallel=True, cache=True)(fn)
+
+    def _device(fn):
+        # per ray helper, inlined into the parallel loops
+        return numba.njit(cache=True, inline="always")(fn)
+else:
+    prange = range
+
+    def _kernel(fn):
+        return fn
+
+    _device = _kernel
+
+
+@_device
+def _hit_sphere(ox, oy, oz, dx, dy, dz, cx, cy, cz, r):
+    ocx, ocy, ocz = ox - cx, oy - cy, oz - cz
+    a = dx * dx + dy * dy + dz * dz
+    b = 2.0 * (ocx * dx + ocy * dy + ocz * dz)
+    c = (ocx * ocx + ocy * ocy + ocz * ocz) - r * r
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return np.inf
+    sqrtd = math.sqrt(discriminant)
+    t0 = (-b - sqrtd) / (2 * a)
+    if t0 > 1e-4:
+        return t0
+    t1 = (-b + sqrtd) / (2 * a)
+    if t1 > 1e-4:
+        return t1
+    return np.inf
+
+
+@_device
+def _hit_ring(ox, oy, oz, dx, dy, dz, cx, cy, cz, inner, outer, nx, ny, nz):
+    denom = nx * dx + ny * dy + nz * dz
+    if abs(denom) < 1e-6:
+        return np.inf
+    t = ((cx - ox) * nx + (cy - oy) * ny + (cz - oz) * nz) / denom
+    if t < 1e-4:
+        return np.inf
+    px, py, pz = ox + t * dx - cx, oy + t * dy - cy, oz + t * dz - cz
+    dist_sq = px * px + py * py + pz * pz
+    if inner * inner <= dist_sq <= outer * outer:
+        return t
+    return np.inf
+
+
+@_kernel
+def closest_hit_kernel(origins, dirs, sphere_centers, sphere_radii, ring_centers, ring_inner, ring_outer,
+                       ring_normals, candidates, t_out, index_out):
+    # closest hit of every ray against the candidate objects (sorted indices, spheres before rings)
+    n_spheres = len(sphere_radii)
+    for k in prange(len(dirs)):
+        ox, oy, oz = origins[k, 0], origins[k, 1], origins[k, 2]
+        dx, dy, dz = dirs[k, 0], dirs[k, 1], dirs[k, 2]
+        best_t = np.inf
+        best_i = -1
+        for i in candidates:
+            if i < n_spheres:
+                c = sphere_centers[i]
+                t = _hit_sphere(ox, oy, oz, dx, dy, dz, c[0], c[1], c[2], sphere_radii[i])
+            else:
+                j = i - n_spheres
+                c = ring_centers[j]
+                n = ring_normals[j]
+                t = _hit_ring(ox, oy, oz, dx, dy, dz, c[0], c[1], c[2], ring_inner[j], ring_outer[j],
+                              n[0], n[1], n[2])
+            # strict comparison keeps the lowest index on ties like Scene.hit
+            if t < best_t:
+                best_t = t
+                best_i = i
+        t_out[k] = best_t
+        index_out[k] = best_i
+
+
+@_kernel
+def occluded_kernel(origins, dirs, t_max, current, centers, radii, caster_offsets, casters, blocked_out):
+    # any hit of every shadow ray against the shadow casters of the object it leaves from
+    # casters[caster_offsets[i]:caster_offsets[i + 1]] are the spheres of Scene.shadow_casters[i]
+    for k in prange(len(dirs)):
+        ox, oy, oz = origins[k, 0], origins[k, 1], origins[k, 2]
+        dx, dy, dz = dirs[k, 0], dirs[k, 1], dirs[k, 2]
+        blocked = False
+        for j in range(caster_offsets[current[k]], caster_offsets[current[k] + 1]):
+            i = casters[j]
+            c = centers[i]
+            if _hit_sphere(ox, oy, oz, dx, dy, dz, c[0], c[1], c[2], radii[i]) < t_max[k]:
+                blocked = True
+                break
+        blocked_out[k] = blocked
+
+
+@_kernel
+def surface_kernel(origins, dirs, t, index, sphere_centers, ring_centers, ring_inner, ring_outer, ring_normals,
+                   point_out, normal_out, u_out, v_out):
+    # hit point, normal and uv of the closest hits like Scene.surface
+    n_spheres = len(sphere_centers)
+    for k in prange(len(dirs)):
+        i = index[k]
+        if i < 0:
+            continue
+        for a in range(3):
+            point_out[k, a] = origins[k, a] + t[k] * dirs[k, a]
+        if i < n_spheres:
+            nx = point_out[k, 0] - sphere_centers[i, 0]
+            ny = point_out[k, 1] - sphere_centers[i, 1]
+            nz = point_out[k, 2] - sphere_centers[i, 2]
+            norm = math.sqrt(nx * nx + ny * ny + nz * nz)
+            if norm > 0:
+                nx, ny, nz = nx / norm, ny / norm, nz / norm
+            normal_out[k, 0], normal_out[k, 1], normal_out[k, 2] = nx, ny, nz
+            u_out[k] = 0.5 + math.atan2(nz, nx) / (2 * np.pi)
+            v_out[k] = 0.5 - math.asin(ny) / np.pi
+        else:
+            j = i - n_spheres
+            for a in range(3):
+                normal_out[k, a] = ring_normals[j, a]
+            ox = point_out[k, 0] - ring_centers[j, 0]
+            oy = point_out[k, 1] - ring_centers[j, 1]
+            oz = point_out[k, 2] - ring_centers[j, 2]
+            u_out[k] = math.atan2(oz, ox) / (2 * np.pi) + 0.5
+            v_out[k] = (math.sqrt(ox * ox + oy * oy + oz * oz) - ring_inner[j]) / (ring_outer[j] - ring_inner[j])
+
+
+class JitScene:
+    """
+    scene whose packet queries run the compiled kernels, every other attribute is the wrapped scene
+    scenes large enough for a BVH keep using its traversal
+    """
+    def __init__(self, scene):
+        self.scene = scene
+        self.all_objects = np.arange(len(scene.objects), dtype=np.intp)
+        # per object shadow caster lists of the scene flattened for the kernel (offsets and indices)
+        # they exist when the scene has no BVH, which is the only case the kernels run in
+        if scene.shadow_casters is not None:
+            self.caster_offsets = np.zeros(len(scene.shadow_casters) + 1, dtype=np.intp)
+            self.caster_offsets[1:] = np.cumsum([len(found) for found in scene.shadow_casters])
+            self.casters = np.concatenate([np.empty(0, dtype=np.intp)] + list(scene.shadow_casters)).astype(np.intp)
+
+    def __getattr__(self, name):
+        return getattr(self.scene, name)
+
+    def _use_bvh(self, candidates):
+        return self.scene.bvh is not None and (candidates is None or len(candidates) >= BVH_MIN_OBJECTS)
+
+    def hit_many(self, ray_origins, ray_dirs, candidates=None, out=None):
+        if self._use_bvh(candidates):
+            return self.scene.hit_many(ray_origins, ray_dirs, candidates, out)
+        scene = self.scene
+        origins = np.ascontiguousarray(np.broadcast_to(ray_origins, np.shape(ray_dirs)), dtype=np.float64)
+        dirs = np.ascontiguousarray(ray_dirs, dtype=np.float64)
+        n = len(dirs)
+        candidates = self.all_objects if candidates is None else np.sort(np.asarray(candidates, dtype=np.intp))
+
+        # the kernels write straight into the hit buffer
+        hits = out.rows(n) if out is not None else PacketHit.empty(n)
+        closest_hit_kernel(origins, dirs, scene.sphere_centers, scene.sphere_radii, scene.ring_centers,
+                           scene.ring_inner, scene.ring_outer, scene.ring_normals, candidates, hits.t, hits.index)
+
+        # surface_kernel skips the misses, their attributes stay zero
+        for field in (hits.point, hits.normal, hits.u, hits.v):
+            field.fill(0.0)
+        surface_kernel(origins, dirs, hits.t, hits.index, scene.sphere_centers, scene.ring_centers, scene.ring_inner,
+                       scene.ring_outer, scene.ring_normals, hits.point, hits.normal, hits.u, hits.v)
+        return hits
+
+    def occluded_many(self, ray_origins, ray_dirs, t_max, current):
+        if self._use_bvh(None):
+            return self.scene.occluded_many(ray_origins, ray_dirs, t_max, current)
+        origins = np.ascontiguousarray(np.broadcast_to(ray_origins, np.shape(ray_dirs)), dtype=np.float64)
+        dirs = np.ascontiguousarray(ray_dirs, dtype=np.float64)
+        blocked = np.zeros(len(dirs), dtype=np.bool_)
+        occluded_kernel(origins, dirs, np.ascontiguousarray(t_max, dtype=np.float64),
+                        np.ascontiguousarray(current, dtype=np.intp), self.scene.sphere_centers,
+                        self.scene.sphere_radii, self.caster_offsets, self.casters, blocked)
+        return blocked
+
+
+def jit_scene(scene):
+    # the scene to trace with the jit backend, the scene itself (NumPy kernels) without numba
+    return JitScene(scene) if JIT_AVAILABLE else scene
+
+
+def verify_jit(scene, camera, jitter, settings, tolerance=1e-3, kernels=None):
+    """
+    per pixel equivalence of the jit backend with the reference ray_color (scalar backend)
+    parameters:
+    - jitter: (H, W, S, 2) sub-pixel offsets, keep the frame small, the reference is slow
+    - settings: RenderSettings, the backend is overridden
+    - tolerance: largest allowed difference of a pixel channel (0-255)
+    - kernels: True forces the kernels even without numba (interpreted, very slow), by default
+      they are used when numba is available
+    returns the largest difference, raises AssertionError when it is above tolerance
+    """
+    from ray_tracing.render import RenderSettings, render_rays
+    from ray_tracing.wavefront import WavefrontRenderer
+
+    origins, directions = camera.get_rays(jitter)
+    reference = render_rays(scene, origins, directions, RenderSettings(
+        settings.ambient, settings.max_depth, "scalar", settings.chunk_size))
+    traced = JitScene(scene) if (JIT_AVAILABLE if kernels is None else kernels) else scene
+    image = WavefrontRenderer(traced, settings.ambient, chunk_size=settings.chunk_size).render(origins, directions)
+    diff = float(np.max(np.abs(image - reference))) if image.size else 0.0
+    if diff > tolerance:
+        y, x = np.unravel_index(np.argmax(np.max(np.abs(image - reference), axis=-1)), image.shape[:2])
+        raise AssertionError(f"jit backend differs from ray_color by {diff} at pixel ({y}, {x})")
+    return diff
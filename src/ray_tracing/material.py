@@ -36,15 +36,15 @@ class Material:
         self.rim_power = rim_power
     
     def emitted(self, u, v):
+        return self.emitted_many(np.array([u]), np.array([v]))[0]
+
+    def emitted_many(self, u, v):
+        # (N, 3) emitted colors at arrays of texture coordinates, zero for materials that do not emit
         if not self.emissive:
-            return np.zeros(3, dtype=np.float32)
+            return np.zeros((len(u), 3), dtype=np.float32)
+
+        base_color = self.texture.value_many(u, v)
 
-        base_color = self.texture.value(u, v)
-        if isinstance(base_color, (list, tuple)):
-            base_color = np.array(base_color, dtype=np.float32)
-        
         # halo effect gets warm color and increased instensity
         emission = base_color*np.array([2.2,1.6,1.2], dtype=np.float32)*self.halo_strength
         return np.clip(emission, 0, 255)
-    
-    
\ No newline at end of file
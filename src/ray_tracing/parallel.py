@@ -0,0 +1,165 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+from tqdm import tqdm
+
+from ray_tracing.render import render_rays
+
+# tile parallel rendering
+# the frame is cut into tiles that a process pool renders, the scene, camera and settings are
+# shipped once per worker through the pool initializer and the jitter and the image live in
+# shared memory, so a task is only the tile rectangle and its result is written in place
+
+
+def frame_tiles(height, width, tile_size):
+    # (y0, y1, x0, x1) rectangles covering the frame in row major order
+    return [
+        (y, min(y + tile_size, height), x, min(x + tile_size, width))
+        for y in range(0, height, tile_size)
+        for x in range(0, width, tile_size)
+    ]
+
+
+def render_tile(scene, camera, jitter, tile, settings, candidates=None, cost=None):
+    # every tile only depends on its own rays, which makes the output independent of the scheduling
+    # candidates optionally lists the only objects the primary rays of the tile can hit
+    # cost is an optional (H, W) per pixel cost map of the whole frame, see render_rays
+    y0, y1, x0, x1 = tile
+    origins, directions = camera.get_rays(jitter[y0:y1, x0:x1], region=tile)
+    return render_rays(scene, origins, directions, settings, candidates=candidates,
+                       cost=cost[y0:y1, x0:x1] if cost is not None else None)
+
+
+class SharedArray:
+    # numpy array backed by a named shared memory block that other processes can attach to
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @property
+    def spec(self):
+        # picklable description used to attach from another process
+        return self.shm.name, self.shape, self.dtype.str
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shape, dtype, name=name)
+
+    def close(self):
+        # views of the buffer must be dropped before the block can be closed
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+_worker = {}
+
+
+def _init_worker(scene, camera, settings, jitter_spec, image_spec, bins):
+    _worker["scene"] = scene
+    _worker["bins"] = bins
+    _worker["camera"] = camera
+    _worker["settings"] = settings
+    _worker["jitter"] = SharedArray.attach(jitter_spec)
+    _worker["image"] = SharedArray.attach(image_spec)
+
+
+def _render_worker_tile(tile):
+    y0, y1, x0, x1 = tile
+    candidates = _worker["bins"][tile] if _worker["bins"] is not None else None
+    _worker["image"].array[y0:y1, x0:x1] = render_tile(
+        _worker["scene"], _worker["camera"], _worker["jitter"].array, tile, _worker["settings"], candidates)
+    return tile
+
+
+def render_tiles(scene, camera, jitter, settings, tile_size=32, workers=1, desc=None, bins=None, cost=None):
+    """
+    render the (H, W, 3) image tile by tile
+    parameters:
+    - jitter: (H, W, S, 2) sub-pixel offsets, see CAMERA.get_rays
+    - tile_size: edge length of the square tiles in pixels
+    - workers: number of processes, 1 renders the same tiles in this process
+    - bins: optional candidate objects per tile from ray_tracing.binning.bin_objects with the same tile_size
+    - cost: optional (H, W) array the per pixel render time is added to, see render_rays, needs workers=1
+    the result does not depend on the number of workers
+    """
+    height, width = jitter.shape[:2]
+    tiles = frame_tiles(height, width, tile_size)
+    if cost is not None and workers > 1:
+        raise ValueError("the per pixel cost is only measured with workers=1")
+
+    if workers <= 1:
+        image = np.zeros((height, width, 3), dtype=np.float32)
+        for tile in tqdm(tiles, desc=desc, leave=False, disable=desc is None):
+            y0, y1, x0, x1 = tile
+            candidates = bins[tile] if bins is not None else None
+            image[y0:y1, x0:x1] = render_tile(scene, camera, jitter, tile, settings, candidates, cost)
+        return image
+
+    shared_jitter = SharedArray(jitter.shape, np.float64)
+    shared_image = SharedArray((height, width, 3), np.float32)
+    try:
+        shared_jitter.array[:] = jitter
+        initargs = (scene, camera, settings, shared_jitter.spec, shared_image.spec, bins)
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            done = pool.imap_unordered(_render_worker_tile, tiles)
+            for _ in tqdm(done, total=len(tiles), desc=desc, leave=False, disable=desc is None):
+                pass
+        return shared_image.array.copy()
+    finally:
+        shared_jitter.close()
+        shared_image.close()
+
+
+# frame parallel rendering
+# whole frames are rendered by a process pool into the slots of a shared memory ring buffer
+# and handed to a single consumer in frame order, the consumer reads the slot in place
+# frame i is only scheduled after frame i - slots was consumed, so a slot is never overwritten early
+
+
+def _init_frame_worker(render_fn, ring_spec):
+    _worker["render_frame"] = render_fn
+    _worker["ring"] = SharedArray.attach(ring_spec)
+
+
+def _render_worker_frame(index, args):
+    ring = _worker["ring"].array
+    ring[index % len(ring)] = _worker["render_frame"](*args)
+    return index
+
+
+def render_frames(render_fn, frame_args, shape, consume, workers=2, slots=None, dtype=np.uint8):
+    """
+    render many frames in parallel and consume them in order
+    parameters:
+    - render_fn: picklable function, render_fn(*frame_args[i]) returns frame i as an array of shape
+    - frame_args: one argument tuple per frame
+    - shape: shape of every frame, for example (H, W, 3)
+    - consume: called as consume(i, frame) in frame order, frame is a view into the ring buffer
+      that is only valid during the call
+    - workers: number of rendering processes
+    - slots: frames the ring buffer holds, defaults to twice the number of workers
+    """
+    slots = slots or 2 * workers
+    ring = SharedArray((slots,) + tuple(shape), dtype)
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_frame_worker, initargs=(render_fn, ring.spec)) as pool:
+            pending = {}
+            next_submit = 0
+            for index in range(len(frame_args)):
+                # keep the pool busy without letting a frame reuse a slot that is not consumed yet
+                while next_submit < len(frame_args) and next_submit < index + slots:
+                    pending[next_submit] = pool.apply_async(
+                        _render_worker_frame, (next_submit, frame_args[next_submit]))
+                    next_submit += 1
+                pending.pop(index).get()
+                consume(index, ring.array[index % slots])
+    finally:
+        ring.close()
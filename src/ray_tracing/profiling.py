@@ -0,0 +1,162 @@
+import json
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+# opt-in render instrumentation
+# while a profiler is active, the functions of every render stage are replaced by wrappers that
+# count their work and time them, leaving active puts the original functions back, so a render
+# without profiling runs the untouched code and pays nothing
+# stage times are exclusive: time spent in a nested stage (the texture fetch inside the background,
+# the closest hit query inside an intersection on the BVH) is only booked on the inner stage, so the
+# stages add up to the time of the frame
+
+# heatmap colors from cheap to expensive pixels
+HEATMAP_STOPS = np.array([
+    [0, 0, 0],
+    [80, 18, 123],
+    [222, 73, 104],
+    [252, 170, 40],
+    [252, 253, 191],
+], dtype=np.float64)
+
+
+def _hooks():
+    # (owner, attribute, stage, counter, amount(args, result)) of every instrumented function
+    # the ray / object tests are only counted, their time belongs to the query (closest hit or shadow) they run in
+    # imported here so the profiler does not pull the renderer in when it is only imported
+    from camera.camera import CAMERA
+    from ray_tracing import jit, ray, scene, wavefront
+    from ray_tracing.sphere import Ring, Sphere
+    from ray_tracing.texture import ImageTexture
+
+    def rays(args, result):
+        return int(np.prod(result[1].shape[:-1]))
+
+    def one(args, result):
+        return 1
+
+    def first_len(args, result):
+        return len(args[1])
+
+    return [
+        (CAMERA, "get_rays", "ray_generation", "primary_rays", rays),
+        (CAMERA, "get_pixel_rays", "ray_generation", "primary_rays", rays),
+        (scene.Scene, "pack", "scene_setup", None, None),
+        (scene.Scene, "hit", "intersection", None, None),
+        (scene.Scene, "hit_many", "intersection", None, None),
+        (jit.JitScene, "hit_many", "intersection", None, None),
+        (Sphere, "distance", None, "intersection_tests", one),
+        (Ring, "distance", None, "intersection_tests", one),
+        (Sphere, "occludes", None, "intersection_tests", one),
+        (scene, "hit_spheres", None, "intersection_tests", lambda args, result: result.size),
+        (scene, "hit_rings", None, "intersection_tests", lambda args, result: result.size),
+        (scene, "occluded_by_spheres", None, "intersection_tests",
+         lambda args, result: len(args[1]) * len(args[4])),
+        (ray, "hard_shadow", "shadowing", "shadow_rays", one),
+        (wavefront, "hard_shadow_many", "shadowing", "shadow_rays", lambda args, result: len(args[0])),
+        (ImageTexture, "value", "texture", "texture_fetches", one),
+        (ImageTexture, "value_many", "texture", "texture_fetches", first_len),
+        (ray, "vibrant", "vibrancy", None, None),
+        (wavefront, "vibrant", "vibrancy", None, None),
+        (ray, "background_color", "background", "background_rays", one),
+        (wavefront, "shade_background", "background", "background_rays", lambda args, result: len(result)),
+    ]
+
+
+class RenderProfiler:
+    """counters and exclusive stage times of the renders run while it is active"""
+    def __init__(self):
+        self.counters = {}
+        self.seconds = {}
+        self.calls = {}
+        self._stack = []
+        self._saved = []
+
+    def reset(self):
+        self.counters.clear()
+        self.seconds.clear()
+        self.calls.clear()
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def stage(self, name):
+        # time the block as stage name, minus the time of the stages nested in it
+        frame = [time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed - frame[1]
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def _wrap(self, fn, stage, counter, amount):
+        profiler = self
+
+        def wrapper(*args, **kwargs):
+            if stage is None:
+                result = fn(*args, **kwargs)
+            else:
+                with profiler.stage(stage):
+                    result = fn(*args, **kwargs)
+            if counter is not None:
+                profiler.count(counter, amount(args, result))
+            return result
+        return wrapper
+
+    @contextmanager
+    def active(self):
+        # install the hooks for the duration of the block, not reentrant
+        if self._saved:
+            raise RuntimeError("profiler is already active")
+        for owner, name, stage, counter, amount in _hooks():
+            original = owner.__dict__[name] if isinstance(owner, type) else getattr(owner, name)
+            self._saved.append((owner, name, original))
+            setattr(owner, name, self._wrap(original, stage, counter, amount))
+        try:
+            yield self
+        finally:
+            for owner, name, original in reversed(self._saved):
+                setattr(owner, name, original)
+            self._saved.clear()
+
+    def report(self, **info):
+        # json serializable summary, info is stored alongside (frame index, resolution, ...)
+        total = sum(self.seconds.values())
+        stages = {
+            name: {"seconds": seconds, "calls": self.calls[name],
+                   "share": seconds / total if total > 0 else 0.0}
+            for name, seconds in sorted(self.seconds.items(), key=lambda item: -item[1])
+        }
+        return dict(info, total_seconds=total, stages=stages, counters=dict(sorted(self.counters.items())))
+
+    def save(self, path, **info):
+        with open(path, "w") as f:
+            json.dump(self.report(**info), f, indent=2)
+
+
+def cost_heatmap(cost, percentile=99.0):
+    """
+    (H, W, 3) uint8 image of a per pixel cost map, e.g. the seconds from render_rays(cost=...)
+    the scale saturates at the given percentile so a few outliers do not flatten the rest
+    """
+    top = np.percentile(cost, percentile) if cost.size else 0.0
+    level = np.clip(cost / top, 0.0, 1.0) if top > 0 else np.zeros(cost.shape)
+    positions = np.linspace(0.0, 1.0, len(HEATMAP_STOPS))
+    rgb = [np.interp(level, positions, HEATMAP_STOPS[:, c]) for c in range(3)]
+    return np.stack(rgb, axis=-1).astype(np.uint8)
+
+
+def save_heatmap(cost, path, percentile=99.0):
+    Image.fromarray(cost_heatmap(cost, percentile)).save(path)
+
+
+profiler = RenderProfiler()
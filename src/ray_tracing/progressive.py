@@ -0,0 +1,73 @@
+import os
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+from ray_tracing.adaptive import SampleAccumulator
+from ray_tracing.parallel import frame_tiles
+from ray_tracing.render import render_rays
+
+# progressive rendering with checkpoints
+# the frame is refined in passes that add samples_per_pass samples to every pixel, tile by tile
+# the accumulator is saved to disk every checkpoint_interval seconds, a later run loads it and
+# continues with the first tile that is behind, the jitter of a tile only depends on the seed, the
+# pass and the tile, so an interrupted and resumed render is identical to an uninterrupted one
+
+
+def tile_rng(seed, pass_index, tile_index):
+    return np.random.default_rng([seed, pass_index, tile_index])
+
+
+def render_progressive(scene, camera, settings, passes, checkpoint_path, samples_per_pass=1, seed=0,
+                       tile_size=64, checkpoint_interval=60.0, preview=None, meta=None, desc=None):
+    """
+    render the frame in passes and keep the progress in a checkpoint file
+    parameters:
+    - passes: total number of passes, the final image has passes * samples_per_pass samples per pixel
+    - checkpoint_path: .npz file of the accumulator, resumed from when it exists
+    - samples_per_pass: samples added to every pixel per pass
+    - seed: seed of the sub-pixel offsets, part of the checkpoint meta data
+    - tile_size: edge length of the tiles, the unit of work between two checkpoints
+    - checkpoint_interval: seconds between checkpoints, a checkpoint is also written at the end
+    - preview: optional callable(accumulator) called after every checkpoint, e.g. to write a PNG
+    - meta: json serializable description of the render (scene time, camera, ...) stored in the
+      checkpoint, resuming a checkpoint with other meta data raises ValueError
+    returns the SampleAccumulator
+    """
+    height, width = camera.height, camera.width
+    meta = dict(meta or {}, width=width, height=height, samples_per_pass=samples_per_pass, seed=seed,
+                tile_size=tile_size)
+    if os.path.exists(checkpoint_path):
+        acc = SampleAccumulator.load(checkpoint_path, **meta)
+    else:
+        acc = SampleAccumulator(height, width)
+
+    def checkpoint():
+        acc.save(checkpoint_path, **meta)
+        if preview is not None:
+            preview(acc)
+
+    tiles = frame_tiles(height, width, tile_size)
+    # a tile is done with pass p once its pixels hold (p + 1) * samples_per_pass samples
+    done = [int(acc.count[y0, x0]) // samples_per_pass for y0, _, x0, _ in tiles]
+    work = [(p, i) for p in range(min(done), passes) for i in range(len(tiles)) if done[i] <= p]
+
+    last_checkpoint = time.monotonic()
+    for pass_index, tile_index in tqdm(work, desc=desc, leave=False, disable=desc is None):
+        y0, y1, x0, x1 = tile = tiles[tile_index]
+        jitter = tile_rng(seed, pass_index, tile_index).random((y1 - y0, x1 - x0, samples_per_pass, 2))
+        origins, directions = camera.get_rays(jitter, region=tile)
+        # every sample as its own (1 x 1 sample) pixel gives the unaveraged colors
+        colors = render_rays(scene, origins.reshape(-1, samples_per_pass, 1, 3),
+                             directions.reshape(-1, samples_per_pass, 1, 3), settings)
+        ys, xs = np.indices((y1 - y0, x1 - x0)).reshape(2, -1)
+        acc.add(ys + y0, xs + x0, colors)
+
+        if time.monotonic() - last_checkpoint >= checkpoint_interval:
+            checkpoint()
+            last_checkpoint = time.monotonic()
+
+    if work or not os.path.exists(checkpoint_path):
+        checkpoint()
+    return acc
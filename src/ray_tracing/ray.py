@@ -20,100 +20,101 @@ def hard_shadow(point, scene, current_sphere, light_sphere):
     #  offset the origin of the shadow ray to avoid self intersection which is the shadow acne
     shadow_origin = point + 1e-4 * light_dir
 
-    # check all objects in the scene to see if any block the light
-    for sphere in scene.spheres:
-        # skip the current surface sphere and any light emitting spheres because they will not be shaded
-        if sphere is current_sphere or sphere.material.emissive:
-            continue
-
-        # cast a shadow ray towards the light
-        hit_rec = sphere.hit(shadow_origin, light_dir)
-
-        # if the ray hits another object before reaching the light source it's in shadow
-        if hit_rec and hit_rec.t < dist_to_light:
-            return 0.0  # in shadow light is blocked so we return black for dark shadows
+    # only the spheres that can reach into the shadow cone of this object are tested
+    # and the first one in the way is enough, no hit point or normal is needed
+    if scene.occluded(shadow_origin, light_dir, dist_to_light, current_sphere, light_sphere):
+        return 0.0  # in shadow light is blocked so we return black for dark shadows
 
     # if no obstruction is found the point is lighted by this light sample
     return 1.0 
 
 
 
-def ray_color(ray_origin, ray_dir, scene, ambient, max_depth, depth=0):
-    if depth > max_depth:
-        return np.zeros(3, dtype=np.float32)
-
-    hit_record = scene.hit(ray_origin, ray_dir)
+def background_color(ray_origin, ray_dir, scene):
+    # color of a ray that leaves the scene: background texture, nebula and sun corona
+    # a baked environment map replaces the per ray background math when the scene has one
+    if scene.environment is not None:
+        return scene.environment.sample(ray_dir[None])[0]
 
-    if not hit_record:
-        base_col = np.zeros(3, dtype=np.float32)
-        
-        # nebula effect
-        dir = normalize(ray_dir)
-        nebula_intensity = 0.3  
-        # creating noise patterns using sin function to simulate the cloud form of nebula
-        u, v = get_sphere_uv(dir)
-        noise1 = np.sin(u * 30 + v * 40) * 0.5 + 0.5  
-        noise2 = np.sin(u * 50 - v * 30) * 0.5 + 0.5
-        noise3 = np.sin(-u * 20 + v * 60) * 0.5 + 0.5
-        
-        # applying different colors to each noise channel with different intensities and falloff
-        # the exponents to make the colors stand out clearly in the dark
-        nebula_blue = np.array([0.2, 0.3, 0.5]) * noise1**3 * nebula_intensity * 0.7
-        nebula_purple = np.array([0.4, 0.2, 0.5]) * noise2**4 * nebula_intensity * 0.5
-        nebula_red = np.array([0.5, 0.15, 0.2]) * noise3**5 * nebula_intensity * 0.3
-
-        # combined colored noise channels to form the final nebula color
-        nebula_col = (nebula_blue + nebula_purple + nebula_red) * 0.7
-
-        if scene.background_texture:
-            tex_col = scene.background_texture.value(u, v) 
-            # blend the texture background with the nebula
-            base_col = tex_col * (1.0 - nebula_intensity*0.5) + nebula_col*255.0
-        else:
-            base_col = nebula_col * 255.0
+    base_col = np.zeros(3, dtype=np.float32)
+    
+    # nebula effect
+    dir = normalize(ray_dir)
+    nebula_intensity = 0.3  
+    # creating noise patterns using sin function to simulate the cloud form of nebula
+    u, v = get_sphere_uv(dir)
+    noise1 = np.sin(u * 30 + v * 40) * 0.5 + 0.5  
+    noise2 = np.sin(u * 50 - v * 30) * 0.5 + 0.5
+    noise3 = np.sin(-u * 20 + v * 60) * 0.5 + 0.5
+    
+    # applying different colors to each noise channel with different intensities and falloff
+    # the exponents to make the colors stand out clearly in the dark
+    nebula_blue = np.array([0.2, 0.3, 0.5]) * noise1**3 * nebula_intensity * 0.7
+    nebula_purple = np.array([0.4, 0.2, 0.5]) * noise2**4 * nebula_intensity * 0.5
+    nebula_red = np.array([0.5, 0.15, 0.2]) * noise3**5 * nebula_intensity * 0.3
+
+    # combined colored noise channels to form the final nebula color
+    nebula_col = (nebula_blue + nebula_purple + nebula_red) * 0.7
+
+    if scene.background_texture:
+        tex_col = scene.background_texture.value(u, v) 
+        # blend the texture background with the nebula
+        base_col = tex_col * (1.0 - nebula_intensity*0.5) + nebula_col*255.0
+    else:
+        base_col = nebula_col * 255.0
 
 
-        # sun corona calculations
-        sun = scene.light
-        sun_dir = normalize(sun.center - ray_origin)
-        ray_dir_norm = normalize(ray_dir)
-        
-        # calculate angle between view ray and sun direction
-        cos_angle = np.dot(ray_dir_norm, sun_dir)
-        angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))
-        
-        # calculate sun angular radius
-        sun_dist = np.linalg.norm(sun.center - ray_origin)
-        sun_angular_radius = np.arcsin(sun.radius / sun_dist)
-        
-        # corona parameters
-        corona_start = sun_angular_radius 
-        corona_end = sun_angular_radius * 3.0
+    # sun corona calculations
+    sun = scene.light
+    sun_dir = normalize(sun.center - ray_origin)
+    ray_dir_norm = normalize(ray_dir)
+    
+    # calculate angle between view ray and sun direction
+    cos_angle = np.dot(ray_dir_norm, sun_dir)
+    angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))
+    
+    # calculate sun angular radius
+    sun_dist = np.linalg.norm(sun.center - ray_origin)
+    sun_angular_radius = np.arcsin(sun.radius / sun_dist)
+    
+    # corona parameters
+    corona_start = sun_angular_radius 
+    corona_end = sun_angular_radius * 3.0
+    
+    if angle < corona_end:
+        corona_dist = (angle - corona_start) / (corona_end - corona_start)
         
-        if angle < corona_end:
-            corona_dist = (angle - corona_start) / (corona_end - corona_start)
+        if corona_dist < 0:
+            pass
+        else:
+            corona_intensity = np.exp(-corona_dist * 4.0) * (1.0 - corona_dist)
+            inner_color = np.array([2.5, 1.8, 1.0])
+            outer_color = np.array([0.5, 0.7, 1.2])
+            corona_color = inner_color * (1.0 - corona_dist) + outer_color * corona_dist
             
-            if corona_dist < 0:
-                pass
-            else:
-                corona_intensity = np.exp(-corona_dist * 4.0) * (1.0 - corona_dist)
-                inner_color = np.array([2.5, 1.8, 1.0])
-                outer_color = np.array([0.5, 0.7, 1.2])
-                corona_color = inner_color * (1.0 - corona_dist) + outer_color * corona_dist
-                
-                if corona_dist < 0.8:
-                    sun_right = normalize(np.cross(sun_dir, np.array([0, 1, 0])))
-                    sun_up = normalize(np.cross(sun_dir, sun_right))
-                    ray_angle = np.arctan2(np.dot(ray_dir_norm, sun_up), 
-                                          np.dot(ray_dir_norm, sun_right))
-                    
-                    ray_count = 3
-                    ray_factor = (np.sin(ray_angle * ray_count) ** 16) * (1.0 - corona_dist)
-                    corona_color += np.array([1.5, 1.2, 0.8]) * ray_factor * 0.5
+            if corona_dist < 0.8:
+                sun_right = normalize(np.cross(sun_dir, np.array([0, 1, 0])))
+                sun_up = normalize(np.cross(sun_dir, sun_right))
+                ray_angle = np.arctan2(np.dot(ray_dir_norm, sun_up), 
+                                      np.dot(ray_dir_norm, sun_right))
                 
-                base_col += corona_color * corona_intensity * 150.0
+                ray_count = 3
+                ray_factor = (np.sin(ray_angle * ray_count) ** 16) * (1.0 - corona_dist)
+                corona_color += np.array([1.5, 1.2, 0.8]) * ray_factor * 0.5
+            
+            base_col += corona_color * corona_intensity * 150.0
+
+    return np.clip(base_col, 0.0, 255.0)
+
+
+def ray_color(ray_origin, ray_dir, scene, ambient, max_depth, depth=0, candidates=None):
+    if depth > max_depth:
+        return np.zeros(3, dtype=np.float32)
 
-        return np.clip(base_col, 0.0, 255.0)
+    hit_record = scene.hit(ray_origin, ray_dir, candidates)
+
+    if not hit_record:
+        return background_color(ray_origin, ray_dir, scene)
     
     # saturn ring shading
     if isinstance(hit_record.sphere, Ring):
@@ -162,8 +163,8 @@ def ray_color(ray_origin, ray_dir, scene, ambient, max_depth, depth=0):
         return np.clip(emitted * np.array([1.7, 1.4, 1.1]), 0.0, 255.0) 
 
     # shading of planets
-    tex_color = hit_record.sphere.material.texture.value(hit_record.u, hit_record.v)
-    tex_color = enhance_vibrancy(tex_color)
+    # the vibrancy boost only depends on the texel so it is baked into a texture variant once
+    tex_color = vibrant(hit_record.sphere.material.texture).value(hit_record.u, hit_record.v)
     
     shadow_strength = hard_shadow(hit_record.point, scene, hit_record.sphere, scene.light)
     in_shadow = shadow_strength < 0.1
@@ -205,6 +206,12 @@ def ray_color(ray_origin, ray_dir, scene, ambient, max_depth, depth=0):
 
     return np.clip(shaded_color , 0.0, 255.0)
 
+VIBRANT_VARIANT = "vibrant"
+
+def vibrant(texture):
+    """texture with enhance_vibrancy applied to every texel, cached on the texture"""
+    return texture.variant(VIBRANT_VARIANT, enhance_vibrancy_many)
+
 def enhance_vibrancy(rgb):
     """boost saturation and contrast of the colors to make it more vibrant"""
     hsv = rgb_to_hsv(rgb / 255.0)
@@ -216,6 +223,51 @@ def enhance_vibrancy(rgb):
         rgb[0] *= 1.2
     return np.clip(rgb, 0, 255)
 
+def enhance_vibrancy_many(rgb):
+    """vectorized enhance_vibrancy for an (..., 3) array of colors, follows the scalar helpers step by step"""
+    rgb = np.asarray(rgb, dtype=np.float64)
+    # rgb_to_hsv divides by 255 on its own so the scalar path scales twice, kept here for identical colors
+    c = rgb / 255.0 / 255.0
+    r, g, b = c[..., 0], c[..., 1], c[..., 2]
+    maxc = np.max(c, axis=-1)
+    minc = np.min(c, axis=-1)
+    v = maxc
+    grey = minc == maxc
+    span = np.where(grey, 1.0, maxc - minc)
+    s = np.where(grey, 0.0, (maxc - minc) / np.where(grey, 1.0, maxc))
+    rc = (maxc - r) / span
+    gc = (maxc - g) / span
+    bc = (maxc - b) / span
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(grey, 0.0, (h / 6.0) % 1.0)
+
+    # doubling saturation and increasing contrast
+    s = np.minimum(1.0, s * 2.0)
+    v = v**0.8
+
+    # hsv_to_rgb, the six hue sectors are picked with a lookup instead of branches
+    i = (h * 6.0).astype(np.int64)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+    sectors = np.stack([
+        np.stack([v, t, p], axis=-1),
+        np.stack([q, v, p], axis=-1),
+        np.stack([p, v, t], axis=-1),
+        np.stack([p, q, v], axis=-1),
+        np.stack([t, p, v], axis=-1),
+        np.stack([v, p, q], axis=-1),
+    ], axis=0)
+    out = np.take_along_axis(sectors, i[None, ..., None], axis=0)[0]
+    out = np.where((s == 0.0)[..., None], v[..., None], out) * 255.0 * 255.0
+
+    # making red more visible
+    red = (out[..., 0] > out[..., 1]) & (out[..., 0] > out[..., 2])
+    out[..., 0] = np.where(red, out[..., 0] * 1.2, out[..., 0])
+    return np.clip(out, 0, 255)
+
 def compute_specular(hit_rec, ray_dir, light_dir):
     """
     compute the specular reflection component based on the Phong reflection model.
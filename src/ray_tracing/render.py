@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+from ray_tracing.jit import jit_scene
+from ray_tracing.ray import ray_color
+from ray_tracing.wavefront import WavefrontRenderer
+
+BACKENDS = ("scalar", "wavefront", "jit")
+
+
+class RenderSettings:
+    def __init__(self, ambient=0.01, max_depth=3, backend="scalar", chunk_size=65536):
+        """
+        parameters:
+        - ambient: ambient light term passed to the shading
+        - max_depth: recursion limit of ray_color
+        - backend: "scalar" shades ray by ray with ray_color, "wavefront" shades whole chunks of rays,
+          "jit" is the wavefront backend with compiled intersection kernels (NumPy ones without numba)
+        - chunk_size: rays per chunk for the wavefront backend
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        self.ambient = ambient
+        self.max_depth = max_depth
+        self.backend = backend
+        self.chunk_size = chunk_size
+
+
+def render_rays(scene, origins, directions, settings, desc=None, candidates=None, cost=None):
+    # shade (H, W, S, 3) primary rays and average the samples into an (H, W, 3) image
+    # candidates optionally lists the only objects the primary rays can hit, see ray_tracing.binning
+    # cost is an optional (H, W) array, the scalar backend adds the seconds spent on every pixel to it
+    height, width, samples, _ = directions.shape
+
+    if settings.backend in ("wavefront", "jit"):
+        traced = jit_scene(scene) if settings.backend == "jit" else scene
+        renderer = WavefrontRenderer(traced, settings.ambient, chunk_size=settings.chunk_size)
+        return renderer.render(origins, directions, candidates)
+
+    # initializing the image buffer
+    image = np.zeros((height, width, 3), dtype=np.float32)
+
+    # render loop
+    for y in tqdm(range(height), desc=desc, leave=False, disable=desc is None):
+        for x in range(width):
+            if cost is not None:
+                start = time.perf_counter()
+            color = np.zeros(3, dtype=np.float32)
+            for s in range(samples):
+                # calculating pixel color
+                color += ray_color(origins[y, x, s], directions[y, x, s], scene,
+                                   settings.ambient, settings.max_depth, 0, candidates)
+
+            # averaging over all samples
+            image[y, x] = color / samples
+            if cost is not None:
+                cost[y, x] += time.perf_counter() - start
+    return image
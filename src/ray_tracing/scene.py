@@ -1,26 +1,257 @@
+import numpy as np
+
+from ray_tracing.bvh import BVH
+from ray_tracing.sphere import (PacketHit, hit_rings, hit_spheres, occluded_by_spheres, ring_surface,
+                                shadow_casters, sphere_surface)
+
+# from this many objects on the queries traverse a BVH instead of testing every object
+BVH_MIN_OBJECTS = 64
+# Scene.move rebuilds the BVH instead of refitting it once the node boxes grew this much
+BVH_REFIT_LIMIT = 2.0
+
+
 class Scene:
     def __init__(self, spheres, light, rings=None, background_texture=None):
         self.spheres = spheres
         self.rings = rings if rings else []
         self.light = light  
         self.background_texture = background_texture
+        # optional baked background for misses, see ray_tracing.environment
+        self.environment = None
+        self.pack()
+
+    def pack(self, refit=False):
+        # contiguous copies of the object parameters for the packet path
+        # object indices are the spheres first and then the rings, the same order Scene.hit checks them
+        # call this again after moving or adding objects, refit=True keeps the BVH topology
+        # which is cheaper than a rebuild when the same objects only moved
+        self.objects = list(self.spheres) + list(self.rings)
+        self.sphere_centers = np.array([s.center for s in self.spheres], dtype=np.float64).reshape(-1, 3)
+        self.sphere_radii = np.array([s.radius for s in self.spheres], dtype=np.float64)
+        self.ring_centers = np.array([r.center for r in self.rings], dtype=np.float64).reshape(-1, 3)
+        self.ring_inner = np.array([r.inner_radius for r in self.rings], dtype=np.float64)
+        self.ring_outer = np.array([r.outer_radius for r in self.rings], dtype=np.float64)
+        self.ring_normals = np.array([r.normal for r in self.rings], dtype=np.float64).reshape(-1, 3)
+        self._object_index = {id(obj): i for i, obj in enumerate(self.objects)}
+        self.occluders = np.array([not s.material.emissive for s in self.spheres], dtype=bool)
+        self.group_shading()
+
+        lower, upper = self.bounds()
+        if len(self.objects) < BVH_MIN_OBJECTS:
+            self.bvh = None
+        elif refit and getattr(self, "bvh", None) is not None and self.bvh.count == len(self.objects):
+            self.bvh.refit(lower, upper)
+        else:
+            self.bvh = BVH(lower, upper)
+            self._bvh_area = self.bvh.surface_area()
+
+        # with a BVH the shadow rays traverse the tree instead of per object caster lists
+        if self.bvh is None:
+            self.find_shadow_casters()
+        else:
+            self.shadow_casters = None
+
+    def move(self, moved):
+        # refresh the packed positions of the objects (object indices) whose center changed in place
+        # materials, shading groups and object lists stay, only the position dependent data is redone:
+        # a BVH refit (a rebuild once the refitted boxes got too loose) or the shadow caster lists
+        moved = np.asarray(moved, dtype=np.intp)
+        if not len(moved):
+            return
+        n_spheres = len(self.spheres)
+        spheres = moved[moved < n_spheres]
+        rings = moved[moved >= n_spheres] - n_spheres
+        if len(spheres):
+            self.sphere_centers[spheres] = [self.spheres[i].center for i in spheres]
+        if len(rings):
+            self.ring_centers[rings] = [self.rings[i].center for i in rings]
+
+        if self.bvh is None:
+            self.find_shadow_casters()
+            return
+        lower, upper = self.bounds()
+        self.bvh.refit(lower, upper)
+        if self.bvh.surface_area() > self._bvh_area * BVH_REFIT_LIMIT:
+            self.bvh = BVH(lower, upper)
+            self._bvh_area = self.bvh.surface_area()
+
+    def bounding_spheres(self):
+        # (M, 3) centers and (M,) radii of spheres around every object, a ring is bounded by its outer radius
+        centers = np.concatenate([self.sphere_centers, self.ring_centers])
+        radii = np.concatenate([self.sphere_radii, self.ring_outer])
+        return centers, radii
+
+    def bounds(self):
+        # axis aligned (M, 3) lower and upper corners of every object
+        # a ring reaches outer_radius * sqrt(1 - n_k^2) along axis k, which is 0 across its plane
+        ring_extent = self.ring_outer[:, None] * np.sqrt(np.maximum(0.0, 1.0 - self.ring_normals ** 2))
+        extent = np.concatenate([np.repeat(self.sphere_radii[:, None], 3, axis=1), ring_extent])
+        centers = np.concatenate([self.sphere_centers, self.ring_centers])
+        return centers - extent, centers + extent
+
+    def group_shading(self):
+        # objects sharing a material are shaded together by the wavefront renderer
+        # shading_groups maps every object to the first object index with the same material and kind
+        groups = {}
+        self.shading_groups = np.array([
+            groups.setdefault((id(obj.material), i >= len(self.spheres)), i)
+            for i, obj in enumerate(self.objects)
+        ], dtype=np.intp)
+
+    def find_shadow_casters(self):
+        # per object, the spheres that can shadow it from the light, computed once per frame
+        # light emitting spheres and the receiving sphere itself never count as occluders
+        receivers = [(c, r) for c, r in zip(self.sphere_centers, self.sphere_radii)]
+        receivers += [(c, r) for c, r in zip(self.ring_centers, self.ring_outer)]
+        candidates = shadow_casters(receivers, (self.sphere_centers, self.sphere_radii), self.light.center)
+        self.shadow_casters = [
+            np.array([j for j in found if j != i and not self.spheres[j].material.emissive], dtype=np.intp)
+            for i, found in enumerate(candidates)
+        ]
+
+    def casters_for(self, obj, light=None):
+        # spheres to test for shadow rays leaving obj, every non emissive sphere when obj or light is unknown
+        i = self._object_index.get(id(obj))
+        if i is None or (light is not None and light is not self.light):
+            return [s for s in self.spheres if s is not obj and not s.material.emissive]
+        return [self.spheres[j] for j in self.shadow_casters[i]]
+
+    def occluded(self, ray_origin, ray_dir, t_max, obj=None, light=None):
+        # any hit query for a shadow ray leaving obj towards light, stops at the first sphere closer than t_max
+        if self.bvh is not None:
+            n_spheres = len(self.spheres)
+
+            def blocks(i):
+                return (i < n_spheres and self.occluders[i] and self.spheres[i] is not obj
+                        and self.spheres[i].occludes(ray_origin, ray_dir, t_max))
+
+            return self.bvh.any(ray_origin, ray_dir, t_max, blocks)
+
+        for sphere in self.casters_for(obj, light):
+            if sphere.occludes(ray_origin, ray_dir, t_max):
+                return True
+        return False
+
+    def occluded_many(self, ray_origins, ray_dirs, t_max, current):
+        # packet any hit query, current holds the object index each ray leaves from
+        origins = np.broadcast_to(ray_origins, np.shape(ray_dirs))
+        if self.bvh is not None:
+            n_spheres = len(self.spheres)
+
+            def blocks(items, rows):
+                items = items[items < n_spheres]
+                items = items[self.occluders[items]]
+                t = hit_spheres(origins[rows], ray_dirs[rows], self.sphere_centers[items], self.sphere_radii[items])
+                t[current[rows, None] == items[None, :]] = np.inf
+                return np.any(t < t_max[rows, None], axis=1)
+
+            return self.bvh.any_many(origins, ray_dirs, t_max, blocks)
+
+        result = np.zeros(len(ray_dirs), dtype=bool)
+        for i in np.unique(current):
+            rows = np.nonzero(current == i)[0]
+            casters = self.shadow_casters[i]
+            if len(casters):
+                result[rows] = occluded_by_spheres(origins[rows], ray_dirs[rows], t_max[rows],
+                                                   self.sphere_centers[casters], self.sphere_radii[casters])
+        return result
         
-    def hit(self, ray_origin, ray_dir):
-        closest_hit = None
+    def hit(self, ray_origin, ray_dir, candidates=None):
+        # candidates optionally restricts the test to those object indices, e.g. from screen space binning
+        # the objects are compared by distance, only the closest one builds a hit record
+        if candidates is not None and (self.bvh is None or len(candidates) < BVH_MIN_OBJECTS):
+            items = np.sort(candidates)
+        elif self.bvh is not None:
+            t, i = self.bvh.closest(ray_origin, ray_dir, lambda i: self.objects[i].distance(ray_origin, ray_dir))
+            return self.objects[i].record(ray_origin, ray_dir, t) if i >= 0 else None
+        else:
+            # spheres first, then rings
+            items = range(len(self.objects))
+
         closest_t = float('inf')
-        
-        # spheres
-        for sphere in self.spheres:
-            hit_rec = sphere.hit(ray_origin, ray_dir)
-            if hit_rec and hit_rec.t < closest_t:
-                closest_t = hit_rec.t
-                closest_hit = hit_rec
-                
-        # rings
-        for ring in self.rings:
-            hit_rec = ring.hit(ray_origin, ray_dir)
-            if hit_rec and hit_rec.t < closest_t:
-                closest_t = hit_rec.t
-                closest_hit = hit_rec
-                
-        return closest_hit
\ No newline at end of file
+        closest = None
+        for i in items:
+            obj = self.objects[i]
+            t = obj.distance(ray_origin, ray_dir)
+            if t is not None and t < closest_t:
+                closest_t = t
+                closest = obj
+        return closest.record(ray_origin, ray_dir, closest_t) if closest is not None else None
+
+    def hit_distances(self, origins, dirs, items=None):
+        # (N, len(items)) hit distances of the rays against the given objects, every object by default
+        n_spheres = len(self.spheres)
+        if items is None:
+            items = np.arange(len(self.objects))
+        t = np.empty((len(dirs), len(items)))
+        spheres = items < n_spheres
+        if np.any(spheres):
+            s = items[spheres]
+            t[:, spheres] = hit_spheres(origins, dirs, self.sphere_centers[s], self.sphere_radii[s])
+        if not np.all(spheres):
+            r = items[~spheres] - n_spheres
+            t[:, ~spheres] = hit_rings(origins, dirs, self.ring_centers[r], self.ring_inner[r],
+                                       self.ring_outer[r], self.ring_normals[r])
+        return t
+
+    def hit_many(self, ray_origins, ray_dirs, candidates=None, out=None):
+        # closest hit for N rays against every object at once, same result as calling hit per ray
+        # candidates optionally restricts the test to those object indices, e.g. from screen space binning
+        # out is an optional PacketHit buffer of at least N rows (PacketHit.empty) the hits are written to
+        origins = np.ascontiguousarray(np.broadcast_to(ray_origins, np.shape(ray_dirs)), dtype=np.float64)
+        dirs = np.ascontiguousarray(ray_dirs, dtype=np.float64)
+        n = len(dirs)
+        n_spheres = len(self.spheres)
+
+        if candidates is not None and (self.bvh is None or len(candidates) < BVH_MIN_OBJECTS):
+            # sorted candidates keep the lowest object index on ties
+            candidates = np.sort(np.asarray(candidates, dtype=np.intp))
+            t, index = np.full(n, np.inf), np.full(n, -1, dtype=np.intp)
+            if len(candidates):
+                t_all = self.hit_distances(origins, dirs, candidates)
+                best = np.argmin(t_all, axis=1)
+                t = t_all[np.arange(n), best]
+                index = np.where(np.isfinite(t), candidates[best], -1)
+        elif self.bvh is not None:
+            t, index = self.bvh.closest_many(origins, dirs, lambda items, rows: self.hit_distances(
+                origins[rows], dirs[rows], items))
+        else:
+            t_all = self.hit_distances(origins, dirs)
+            # argmin keeps the first object on ties, like the strict comparison in hit
+            index = np.argmin(t_all, axis=1) if len(self.objects) else np.zeros(n, dtype=np.intp)
+            t = t_all[np.arange(n), index] if len(self.objects) else np.full(n, np.inf)
+            index = np.where(np.isfinite(t), index, -1)
+
+        return self.surface(origins, dirs, t, index, out)
+
+    def surface(self, origins, dirs, t, index, out=None):
+        # PacketHit of the closest hits (t, index) of the rays, index -1 marks a miss
+        # written to the first N rows of the buffer out when given, freshly allocated otherwise
+        n = len(dirs)
+        n_spheres = len(self.spheres)
+        hits = out.rows(n) if out is not None else PacketHit.empty(n)
+        hits.t[:] = t
+        hits.index[:] = index
+        t, index, point, normal, u, v = hits.t, hits.index, hits.point, hits.normal, hits.u, hits.v
+        point.fill(0.0)
+        normal.fill(0.0)
+        u.fill(0.0)
+        v.fill(0.0)
+
+        # surface attributes are only computed for the winning object of each ray
+        sphere_rows = np.nonzero((index >= 0) & (index < n_spheres))[0]
+        if len(sphere_rows):
+            idx = index[sphere_rows]
+            point[sphere_rows] = origins[sphere_rows] + t[sphere_rows, None] * dirs[sphere_rows]
+            normal[sphere_rows], u[sphere_rows], v[sphere_rows] = sphere_surface(
+                point[sphere_rows], self.sphere_centers[idx])
+
+        ring_rows = np.nonzero(index >= n_spheres)[0]
+        if len(ring_rows):
+            idx = index[ring_rows] - n_spheres
+            point[ring_rows] = origins[ring_rows] + t[ring_rows, None] * dirs[ring_rows]
+            normal[ring_rows] = self.ring_normals[idx]
+            u[ring_rows], v[ring_rows] = ring_surface(
+                point[ring_rows], self.ring_centers[idx], self.ring_inner[idx], self.ring_outer[idx])
+
+        return hits
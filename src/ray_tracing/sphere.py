@@ -1,9 +1,12 @@
 import numpy as np
 
-from ray_tracing.vectors import get_sphere_uv, normalize
+from ray_tracing.vectors import dot, get_sphere_uv, get_sphere_uv_many, length, normalize
 
 
 class HitRecord:
+    # only built for the closest hit of a ray, the candidates are compared by distance alone
+    __slots__ = ("t", "point", "normal", "sphere", "u", "v")
+
     def __init__(self, t, point, normal, sphere, u, v):
         self.t = t
         self.point = point
@@ -12,30 +15,89 @@ class HitRecord:
         self.u = u
         self.v = v
 
+class PacketHit:
+    """
+    closest hits of a packet of N rays, index is -1 and t is inf where a ray missed
+    the fields are separate arrays (struct of arrays), so a PacketHit allocated once with empty
+    can be reused as the output buffer of Scene.hit_many for every chunk of rays
+    """
+    __slots__ = ("t", "index", "point", "normal", "u", "v")
+
+    def __init__(self, t, index, point, normal, u, v):
+        self.t = t
+        self.index = index
+        self.point = point
+        self.normal = normal
+        self.u = u
+        self.v = v
+
+    @classmethod
+    def empty(cls, n):
+        # uninitialized buffer for the hits of up to n rays
+        return cls(np.empty(n), np.empty(n, dtype=np.intp), np.empty((n, 3)), np.empty((n, 3)),
+                   np.empty(n), np.empty(n))
+
+    def rows(self, n):
+        # the first n hits, views sharing the memory of the buffer
+        return PacketHit(self.t[:n], self.index[:n], self.point[:n], self.normal[:n], self.u[:n], self.v[:n])
+
+    def __len__(self):
+        return len(self.t)
+
+    @property
+    def mask(self):
+        return self.index >= 0
+
 class Sphere:
     def __init__(self, center, radius, material):
         self.center = np.array(center, dtype=np.float32)
         self.radius = radius
         self.material = material
     
-    def hit(self, ray_origin, ray_dir):
+    def distance(self, ray_origin, ray_dir):
+        # distance of the nearest hit in front of the ray origin, None on a miss
+        # no hit point or record is built, Scene.hit only does that for the closest object
         oc = ray_origin - self.center
-        a = np.dot(ray_dir, ray_dir)
-        b = 2.0 * np.dot(oc, ray_dir)
-        c = np.dot(oc, oc) - self.radius**2
-        discriminant = b**2 - 4 * a * c
+        a = dot(ray_dir, ray_dir)
+        b = 2.0 * dot(oc, ray_dir)
+        c = dot(oc, oc) - self.radius * self.radius
+        discriminant = b * b - 4 * a * c
         if discriminant < 0:
             return None
         sqrtd = np.sqrt(discriminant)
-        roots = [(-b - sqrtd) / (2 * a), (-b + sqrtd) / (2 * a)]
-        valid_roots = [t for t in roots if t > 1e-4]
-        if not valid_roots:
-            return None
-        t = min(valid_roots)
+        # a > 0, so the first root is the smaller one
+        t = (-b - sqrtd) / (2 * a)
+        if t > 1e-4:
+            return t
+        t = (-b + sqrtd) / (2 * a)
+        return t if t > 1e-4 else None
+
+    def record(self, ray_origin, ray_dir, t):
+        # hit record of the hit at distance t
         point = ray_origin + t * ray_dir
         normal = normalize(point - self.center)
         u, v = get_sphere_uv(normal)
         return HitRecord(t, point, normal, self, u, v)
+
+    def hit(self, ray_origin, ray_dir):
+        t = self.distance(ray_origin, ray_dir)
+        return None if t is None else self.record(ray_origin, ray_dir, t)
+
+    def occludes(self, ray_origin, ray_dir, t_max):
+        # any hit query for shadow rays: is there a hit closer than t_max
+        # same roots as hit but without the hit point, normal and uv
+        oc = ray_origin - self.center
+        a = dot(ray_dir, ray_dir)
+        b = 2.0 * dot(oc, ray_dir)
+        c = dot(oc, oc) - self.radius * self.radius
+        discriminant = b * b - 4 * a * c
+        if discriminant < 0:
+            return False
+        sqrtd = np.sqrt(discriminant)
+        t = (-b - sqrtd) / (2 * a)
+        if t <= 1e-4:
+            t = (-b + sqrtd) / (2 * a)
+        return 1e-4 < t < t_max
     
 class Ring:
     def __init__(self, center, inner_radius, outer_radius, material):
@@ -45,21 +107,109 @@ class Ring:
         self.material = material
         self.normal = np.array([0, 1, 0], dtype=np.float32) 
         
-    def hit(self, ray_origin, ray_dir):
+    def distance(self, ray_origin, ray_dir):
+        # distance of the hit in the ring band, None on a miss, see Sphere.distance
         # checking of intersection with the ring plane first
-        denom = np.dot(self.normal, ray_dir)
+        denom = dot(self.normal, ray_dir)
         if abs(denom) < 1e-6:
             return None 
             
-        t = np.dot(self.center - ray_origin, self.normal) / denom
+        t = dot(self.center - ray_origin, self.normal) / denom
         if t < 1e-4:
             return None  # behind the ray origin
             
         point = ray_origin + t * ray_dir
-        dist_sq = np.sum((point - self.center)**2)
+        offset = point - self.center
+        dist_sq = dot(offset, offset)
         
-        if self.inner_radius**2 <= dist_sq <= self.outer_radius**2:
-            u = (np.arctan2(point[2] - self.center[2], point[0] - self.center[0]) / (2 * np.pi) + 0.5)
-            v = (np.linalg.norm(point - self.center) - self.inner_radius) / (self.outer_radius - self.inner_radius)
-            return HitRecord(t, point, self.normal, self, u, v)
+        if self.inner_radius * self.inner_radius <= dist_sq <= self.outer_radius * self.outer_radius:
+            return t
         return None
+
+    def record(self, ray_origin, ray_dir, t):
+        # hit record of the hit at distance t
+        point = ray_origin + t * ray_dir
+        offset = point - self.center
+        u = (np.arctan2(point[2] - self.center[2], point[0] - self.center[0]) / (2 * np.pi) + 0.5)
+        v = (length(offset) - self.inner_radius) / (self.outer_radius - self.inner_radius)
+        return HitRecord(t, point, self.normal, self, u, v)
+
+    def hit(self, ray_origin, ray_dir):
+        t = self.distance(ray_origin, ray_dir)
+        return None if t is None else self.record(ray_origin, ray_dir, t)
+
+
+# packet versions of Sphere.hit and Ring.hit
+# origins and dirs are (N, 3), the object parameters are packed (M, ...) arrays
+# they return an (N, M) array of hit distances with inf where the ray misses
+# the arithmetic follows the scalar methods step by step so both paths agree exactly
+
+def hit_spheres(origins, dirs, centers, radii):
+    oc = origins[:, None, :] - centers[None, :, :]
+    d = dirs[:, None, :]
+    a = dot(d, d)
+    b = 2.0 * dot(oc, d)
+    c = dot(oc, oc) - radii * radii
+    discriminant = b * b - 4 * a * c
+    sqrtd = np.sqrt(np.maximum(discriminant, 0.0))
+    t0 = (-b - sqrtd) / (2 * a)
+    t1 = (-b + sqrtd) / (2 * a)
+    t = np.where(t0 > 1e-4, t0, np.where(t1 > 1e-4, t1, np.inf))
+    t[discriminant < 0] = np.inf
+    return t
+
+def hit_rings(origins, dirs, centers, inner_radii, outer_radii, normals):
+    d = dirs[:, None, :]
+    denom = dot(normals[None, :, :], d)
+    parallel = np.abs(denom) < 1e-6
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = dot(centers[None, :, :] - origins[:, None, :], normals[None, :, :]) / denom
+    # nan compares false so parallel rays drop out here as well
+    valid = ~parallel & (t >= 1e-4)
+    point = origins[:, None, :] + np.where(valid, t, 0.0)[..., None] * d
+    dist_sq = dot(point - centers[None, :, :], point - centers[None, :, :])
+    valid &= (inner_radii * inner_radii <= dist_sq) & (dist_sq <= outer_radii * outer_radii)
+    return np.where(valid, t, np.inf)
+
+def occluded_by_spheres(origins, dirs, t_max, centers, radii):
+    # packet any hit query, True where a ray hits one of the spheres closer than its t_max
+    if not len(centers):
+        return np.zeros(len(dirs), dtype=bool)
+    return np.any(hit_spheres(origins, dirs, centers, radii) < t_max[:, None], axis=1)
+
+def shadow_casters(receivers, occluders, light_center):
+    """
+    for every receiver bounding sphere (center, radius) the indices of the occluder spheres that can
+    block a shadow ray from the receiver towards the light point
+    all these rays stay inside the cone spanned by the receiver sphere and the light point, which
+    itself lies inside the capsule of the receiver radius around the receiver to light segment,
+    so an occluder can only cast a shadow when it reaches into that capsule
+    """
+    light_center = np.asarray(light_center, dtype=np.float64)
+    casters = []
+    for center, radius in receivers:
+        axis = light_center - center
+        axis_len_sq = dot(axis, axis)
+        offsets = occluders[0] - center
+        along = dot(offsets, axis) / axis_len_sq if axis_len_sq > 0 else np.zeros(len(offsets))
+        closest = center + np.clip(along, 0.0, 1.0)[:, None] * axis
+        dist = length(occluders[0] - closest)
+        # small relative margin so rounding can never drop a real occluder
+        reach = (occluders[1] + radius) * (1 + 1e-6) + 1e-6
+        casters.append(np.nonzero(dist <= reach)[0])
+    return casters
+
+def sphere_surface(points, centers):
+    # normal and uv at points lying on the spheres with the given centers
+    normal = points - centers
+    norm = length(normal)[:, None]
+    normal = np.divide(normal, norm, out=normal, where=norm > 0)
+    u, v = get_sphere_uv_many(normal)
+    return normal, u, v
+
+def ring_surface(points, centers, inner_radii, outer_radii):
+    # uv at points lying on the rings, the normal is the ring plane normal
+    diff = points - centers
+    u = np.arctan2(diff[:, 2], diff[:, 0]) / (2 * np.pi) + 0.5
+    v = (length(diff) - inner_radii) / (outer_radii - inner_radii)
+    return u, v
@@ -5,6 +5,21 @@ class Texture:
     def value(self, u, v):
         pass
 
+    def value_many(self, u, v):
+        # colors for arrays of u and v as an (N, 3) array, subclasses replace this loop with a gather
+        return np.array([self.value(a, b) for a, b in zip(u, v)], dtype=np.float32).reshape(-1, 3)
+
+    def variant(self, name, transform):
+        # copy of the texture with transform applied to all of its colors
+        # built on first use and cached under name, so per hit color work can be done once per texture
+        variants = self.__dict__.setdefault("_variants", {})
+        if name not in variants:
+            variants[name] = self._transformed(transform)
+        return variants[name]
+
+    def _transformed(self, transform):
+        raise NotImplementedError
+
 class SolidColor(Texture):
     def __init__(self, color):
         self.color = np.array(color, dtype=np.float32)
@@ -12,12 +27,91 @@ class SolidColor(Texture):
     def value(self, u, v):
         return self.color
 
+    def value_many(self, u, v):
+        return np.repeat(self.color[None], len(u), axis=0)
+
+    def _transformed(self, transform):
+        return SolidColor(transform(self.color[None])[0])
+
 class ImageTexture(Texture):
-    def __init__(self, path):
-        self.image = np.array(Image.open(path).convert("RGB"))
+    # rows per block when transforming a whole image, keeps the temporaries small for large maps
+    TRANSFORM_ROWS = 256
+
+    def __init__(self, path, filter="nearest"):
+        """
+        parameters:
+        - path: image file to load
+        - filter: "nearest" or "bilinear", used when sampling the texture
+        """
+        self._set_image(np.array(Image.open(path).convert("RGB")), filter)
+
+    @classmethod
+    def from_array(cls, image, filter="nearest"):
+        texture = cls.__new__(cls)
+        texture._set_image(image, filter)
+        return texture
+
+    def _set_image(self, image, filter):
+        if filter not in ("nearest", "bilinear"):
+            raise ValueError(f"Unknown texture filter: {filter}")
+        self.filter = filter
+        self.height, self.width = image.shape[:2]
+        # texels are converted to float once and kept as one contiguous (h * w, 3) table
+        # so a batch of lookups is a single fancy indexing gather on flat indices
+        self.texels = np.ascontiguousarray(image, dtype=np.float32).reshape(-1, 3)
+
+    @property
+    def nbytes(self):
+        # memory held by the texels and every cached variant
+        variants = self.__dict__.get("_variants", {})
+        return self.texels.nbytes + sum(t.nbytes for t in variants.values() if isinstance(t, ImageTexture))
+
+    @property
+    def image(self):
+        return self.texels.reshape(self.height, self.width, 3)
     
     def value(self, u, v):
-        h, w, _ = self.image.shape
-        tx = int(u * (w - 1))
-        ty = int(v * (h - 1))
-        return self.image[ty, tx].astype(np.float32)
\ No newline at end of file
+        if self.filter == "bilinear":
+            return self.value_many(np.array([u]), np.array([v]))[0]
+        tx = int(u * (self.width - 1)) % self.width
+        ty = min(max(int(v * (self.height - 1)), 0), self.height - 1)
+        return self.texels[ty * self.width + tx].copy()
+
+    def value_many(self, u, v, filter=None):
+        """
+        gather the colors at arrays of texture coordinates
+        u wraps around and v is clamped to the image, returns an (N, 3) float32 array
+        """
+        u = np.asarray(u, dtype=np.float64)
+        v = np.asarray(v, dtype=np.float64)
+        w, h = self.width, self.height
+        # wrap u into [0, 1] without moving u == 1 onto the first column
+        u = np.where((u < 0.0) | (u > 1.0), u - np.floor(u), u)
+        y = np.clip(v, 0.0, 1.0) * (h - 1)
+        x = u * (w - 1)
+
+        if (filter or self.filter) == "nearest":
+            tx = x.astype(np.intp) % w
+            ty = y.astype(np.intp)
+            return self.texels[ty * w + tx]
+
+        x0 = np.floor(x)
+        y0 = np.floor(y)
+        fx = (x - x0)[:, None].astype(np.float32)
+        fy = (y - y0)[:, None].astype(np.float32)
+        x0 = x0.astype(np.intp) % w
+        x1 = (x0 + 1) % w
+        y0 = y0.astype(np.intp)
+        y1 = np.minimum(y0 + 1, h - 1)
+        top = self.texels[y0 * w + x0]
+        top += (self.texels[y0 * w + x1] - top) * fx
+        bottom = self.texels[y1 * w + x0]
+        bottom += (self.texels[y1 * w + x1] - bottom) * fx
+        return top + (bottom - top) * fy
+
+    def _transformed(self, transform):
+        image = self.image
+        out = np.empty(image.shape, dtype=np.float32)
+        for start in range(0, self.height, self.TRANSFORM_ROWS):
+            out[start:start + self.TRANSFORM_ROWS] = transform(image[start:start + self.TRANSFORM_ROWS])
+        return ImageTexture.from_array(out, filter=self.filter)
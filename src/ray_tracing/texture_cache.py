@@ -0,0 +1,146 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from ray_tracing.texture import Texture
+from ray_tracing.texture_store import texture_store
+
+# decoded textures are kept for the whole process so a video does not decode the same images every frame
+DEFAULT_BUDGET_BYTES = 1024 * 1024 * 1024
+
+
+class TextureCache:
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, loader=texture_store.load):
+        """
+        parameters:
+        - budget_bytes: memory budget for the decoded textures, least recently used ones are evicted above it
+        - loader: callable that turns a path into a texture, by default memory maps the baked
+          copy from the texture store and only decodes the image when there is none
+        """
+        self.budget_bytes = budget_bytes
+        self.loader = loader
+        # path -> (mtime, texture), ordered from least to most recently used
+        self._entries = OrderedDict()
+        # path -> lazy handles of that path, see release
+        self._handles = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path):
+        key = os.path.abspath(path)
+        mtime = os.stat(key).st_mtime_ns
+        with self._lock:
+            entry = self._entries.get(key)
+            # a changed file on disk counts as a miss and replaces the stale texture
+            if entry is not None and entry[0] == mtime:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry[1]
+            self.misses += 1
+
+        texture = self.loader(path)
+        with self._lock:
+            if key in self._entries:
+                self._release(key)
+            self._entries[key] = (mtime, texture)
+            self._entries.move_to_end(key)
+            self._evict()
+        return texture
+
+    def lazy(self, path):
+        # texture that is only decoded the first time it is sampled
+        handle = LazyTexture(path, self)
+        with self._lock:
+            self._handles.setdefault(os.path.abspath(path), weakref.WeakSet()).add(handle)
+        return handle
+
+    def release(self):
+        # drop the texture every lazy handle resolved, their next sample goes through get again
+        # call once per frame for handles that outlive a frame: evicted textures are freed, changed
+        # files are reloaded and the hit / miss counts and the LRU order see every frame
+        # within a frame a handle keeps its texture, so a budget below the textures of one frame
+        # does not reload them sample by sample
+        with self._lock:
+            for key in self._handles:
+                self._release(key)
+
+    def _release(self, key):
+        for handle in self._handles.get(key, ()):
+            handle._texture = None
+
+    def nbytes(self):
+        with self._lock:
+            return self._size()
+
+    def _size(self):
+        # sizes are measured on demand since cached variants make textures grow after loading
+        return sum(getattr(texture, "nbytes", 0) for _, texture in self._entries.values())
+
+    def _evict(self):
+        # the most recently used texture always stays, even when it alone is over the budget
+        while len(self._entries) > 1 and self._size() > self.budget_bytes:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def trim(self):
+        # apply the budget again, for example after variants were added to cached textures
+        with self._lock:
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for key in self._entries:
+                self._release(key)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._size(),
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+class LazyTexture(Texture):
+    def __init__(self, path, cache):
+        self.path = path
+        self.cache = cache
+        self._texture = None
+
+    @property
+    def texture(self):
+        # the cache resets _texture on release, a local keeps the texture of this call alive
+        texture = self._texture
+        if texture is None:
+            texture = self._texture = self.cache.get(self.path)
+        return texture
+
+    def __reduce__(self):
+        # only the path travels to other processes, they resolve it through their own shared cache
+        return (_shared_lazy, (self.path,))
+
+    def value(self, u, v):
+        return self.texture.value(u, v)
+
+    def value_many(self, u, v):
+        return self.texture.value_many(u, v)
+
+    def variant(self, name, transform):
+        # variants live on the cached texture so they are reused by later frames as well
+        return self.texture.variant(name, transform)
+
+
+texture_cache = TextureCache()
+
+
+def _shared_lazy(path):
+    return texture_cache.lazy(path)
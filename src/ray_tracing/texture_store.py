@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from ray_tracing.ray import VIBRANT_VARIANT, enhance_vibrancy_many
+from ray_tracing.texture import ImageTexture
+
+# pre-decoded textures
+# every texture is decoded once and written uncompressed as a .npy file next to its derived variants
+# ImageTexture then memory maps these files, so startup skips the PIL decode and all render
+# processes share the same page cache pages instead of each holding a private copy
+
+STORE_DIR = "cache/textures"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+# derived textures baked next to the base image, name -> whole image color transform
+VARIANTS = {VIBRANT_VARIANT: enhance_vibrancy_many}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class TextureStore:
+    def __init__(self, store_dir=STORE_DIR, variants=None):
+        """
+        parameters:
+        - store_dir: directory holding the baked .npy files and their manifests
+        - variants: derived textures to bake, defaults to VARIANTS
+        """
+        self.store_dir = store_dir
+        self.variants = VARIANTS if variants is None else variants
+
+    def _entry(self, path):
+        # file name stem for a source texture, readable and unique per source path
+        source = os.path.abspath(path)
+        tag = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+        stem = os.path.splitext(os.path.basename(source))[0].replace(" ", "_")
+        return os.path.join(self.store_dir, f"{stem}-{tag}")
+
+    def _manifest(self, path):
+        try:
+            with open(self._entry(path) + ".json", "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _files(self, path, manifest):
+        # name -> baked .npy file of an entry, the base image and the variants this store knows
+        entry = self._entry(path)
+        names = ["base"] + [name for name in manifest["variants"] if name in self.variants]
+        return {name: f"{entry}.{name}.npy" for name in names}
+
+    def _files_intact(self, path, manifest):
+        # every baked file still has the size it was written with, a removed or cut short file makes the entry stale
+        sizes = manifest.get("bytes", {})
+        try:
+            return all(os.path.getsize(f) == sizes.get(name) for name, f in self._files(path, manifest).items())
+        except OSError:
+            return False
+
+    def is_fresh(self, path):
+        manifest = self._manifest(path)
+        if manifest is None or not self._files_intact(path, manifest):
+            return False
+        st = os.stat(path)
+        if manifest["size"] == st.st_size and manifest["mtime_ns"] == st.st_mtime_ns:
+            return True
+        # the file was touched or copied, only its content decides whether the entry is stale
+        if manifest["size"] != st.st_size or manifest["sha256"] != file_hash(path):
+            return False
+        manifest["mtime_ns"] = st.st_mtime_ns
+        self._write_manifest(path, manifest)
+        return True
+
+    def _write_manifest(self, path, manifest):
+        tmp = self._entry(path) + ".json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self._entry(path) + ".json")
+
+    def bake(self, path):
+        # decode the texture and write it and its variants to the store
+        os.makedirs(self.store_dir, exist_ok=True)
+        entry = self._entry(path)
+        texture = ImageTexture(path)
+        files = {"base": texture.image}
+        for name, transform in self.variants.items():
+            files[name] = texture.variant(name, transform).image
+        sizes = {}
+        for name, image in files.items():
+            # written to a temporary name first so readers never map a half written file
+            tmp = f"{entry}.{name}.tmp.npy"
+            np.save(tmp, np.ascontiguousarray(image, dtype=np.float32))
+            os.replace(tmp, f"{entry}.{name}.npy")
+            sizes[name] = os.path.getsize(f"{entry}.{name}.npy")
+
+        st = os.stat(path)
+        self._write_manifest(path, {
+            "source": os.path.abspath(path),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": file_hash(path),
+            "shape": list(texture.image.shape),
+            "variants": list(self.variants),
+            "bytes": sizes,
+        })
+        return texture
+
+    def bake_all(self, root="assets/texture", force=False):
+        # bake every image below root, returns {path: "baked" | "fresh"}
+        results = {}
+        for folder, _, names in os.walk(root):
+            for name in sorted(names):
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(folder, name)
+                if not force and self.is_fresh(path):
+                    results[path] = "fresh"
+                else:
+                    self.bake(path)
+                    results[path] = "baked"
+        return results
+
+    def open(self, path, filter="nearest"):
+        # memory mapped texture from the store, None when there is no fresh entry
+        if not self.is_fresh(path):
+            return None
+        manifest = self._manifest(path)
+        try:
+            images = {name: np.load(f, mmap_mode="r") for name, f in self._files(path, manifest).items()}
+        except (OSError, ValueError, EOFError):
+            # a baked file was damaged after is_fresh looked at it, the entry is stale
+            return None
+        if any(list(image.shape) != manifest["shape"] for image in images.values()):
+            return None
+        texture = ImageTexture.from_array(images.pop("base"), filter=filter)
+        for name, image in images.items():
+            texture.__dict__.setdefault("_variants", {})[name] = ImageTexture.from_array(image, filter=filter)
+        return texture
+
+    def load(self, path):
+        # loader for the texture cache, falls back to decoding the image when it was not baked
+        texture = self.open(path)
+        return texture if texture is not None else ImageTexture(path)
+
+
+texture_store = TextureStore()
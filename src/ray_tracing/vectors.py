@@ -1,10 +1,25 @@
 import numpy as np
 import numpy.random as random
 
+def dot(a, b):
+    # dot product over the last axis, works for single vectors and for arrays of vectors
+    # the sum is always taken in the same order so scalar and packet code give identical results
+    # asarray strips pyrr vector types which do not support elementwise indexing
+    a, b = np.asarray(a), np.asarray(b)
+    return a[..., 0] * b[..., 0] + a[..., 1] * b[..., 1] + a[..., 2] * b[..., 2]
+
+def length(v):
+    return np.sqrt(dot(v, v))
+
 def normalize(v):
-    norm = np.linalg.norm(v)
+    norm = length(v)
     return v / norm if norm > 0 else v
 
+def normalize_many(v):
+    # normalize an (..., 3) array of vectors, zero vectors are left untouched
+    norm = length(v)[..., None]
+    return np.divide(v, norm, out=np.array(v, dtype=np.float64), where=norm > 0)
+
 def reflect(v, normal):
     return v - 2 * np.dot(v, normal) * normal
 
@@ -20,4 +35,9 @@ def get_sphere_uv(normal):
     x, y, z = normal
     u = 0.5 + np.arctan2(z, x) / (2 * np.pi)
     v = 0.5 - np.arcsin(y) / np.pi
-    return u, v
\ No newline at end of file
+    return u, v
+
+def get_sphere_uv_many(normals):
+    u = 0.5 + np.arctan2(normals[..., 2], normals[..., 0]) / (2 * np.pi)
+    v = 0.5 - np.arcsin(normals[..., 1]) / np.pi
+    return u, v
@@ -0,0 +1,227 @@
+import numpy as np
+
+from ray_tracing.ray import vibrant
+from ray_tracing.sphere import PacketHit
+from ray_tracing.vectors import dot, get_sphere_uv_many, length, normalize_many
+
+# wavefront (deferred) shading
+# instead of shading one ray at a time like ray_color, all rays of a chunk are traced first
+# then the hits are split by category (miss, ring, sun, planet) with masks and every
+# shading branch of ray_color runs once as a vectorized kernel over its subset of rays
+
+
+def hard_shadow_many(points, scene, current, light_sphere):
+    # vectorized hard_shadow, current holds the object index each point lies on
+    light_dir = light_sphere.center - points
+    dist_to_light = length(light_dir)
+    light_dir = normalize_many(light_dir)
+    shadow_origin = points + 1e-4 * light_dir
+
+    result = np.where(dist_to_light < 1e-4, 0.0, 1.0)
+    rows = np.nonzero(result > 0.0)[0]
+    if len(rows):
+        blocked = scene.occluded_many(shadow_origin[rows], light_dir[rows], dist_to_light[rows], current[rows])
+        result[rows[blocked]] = 0.0
+    return result
+
+
+def background_nebula(dirs, background_texture):
+    # nebula and background texture part of a miss, only depends on the normalized direction
+    nebula_intensity = 0.3
+    u, v = get_sphere_uv_many(dirs)
+    noise1 = np.sin(u * 30 + v * 40) * 0.5 + 0.5
+    noise2 = np.sin(u * 50 - v * 30) * 0.5 + 0.5
+    noise3 = np.sin(-u * 20 + v * 60) * 0.5 + 0.5
+
+    nebula_blue = np.array([0.2, 0.3, 0.5]) * (noise1**3 * nebula_intensity * 0.7)[:, None]
+    nebula_purple = np.array([0.4, 0.2, 0.5]) * (noise2**4 * nebula_intensity * 0.5)[:, None]
+    nebula_red = np.array([0.5, 0.15, 0.2]) * (noise3**5 * nebula_intensity * 0.3)[:, None]
+    nebula_col = (nebula_blue + nebula_purple + nebula_red) * 0.7
+
+    if background_texture:
+        tex_col = background_texture.value_many(u, v)
+        return tex_col * (1.0 - nebula_intensity * 0.5) + nebula_col * 255.0
+    return nebula_col * 255.0
+
+
+def background_corona(origins, dirs, sun):
+    # sun corona part of a miss, depends on the normalized direction and on the eye to sun geometry
+    corona = np.zeros((len(dirs), 3))
+    to_sun = sun.center - origins
+    sun_dir = normalize_many(to_sun)
+    cos_angle = dot(dirs, sun_dir)
+    angle = np.arccos(np.clip(cos_angle, -1.0, 1.0))
+
+    sun_dist = length(to_sun)
+    sun_angular_radius = np.arcsin(sun.radius / sun_dist)
+    corona_start = sun_angular_radius
+    corona_end = sun_angular_radius * 3.0
+
+    corona_dist = (angle - corona_start) / (corona_end - corona_start)
+    rows = np.nonzero((angle < corona_end) & (corona_dist >= 0))[0]
+    if len(rows):
+        cd = corona_dist[rows][:, None]
+        corona_intensity = np.exp(-cd * 4.0) * (1.0 - cd)
+        inner_color = np.array([2.5, 1.8, 1.0])
+        outer_color = np.array([0.5, 0.7, 1.2])
+        corona_color = inner_color * (1.0 - cd) + outer_color * cd
+
+        # light rays around the sun close to its surface
+        rays = rows[corona_dist[rows] < 0.8]
+        if len(rays):
+            sd = sun_dir[rays]
+            sun_right = normalize_many(np.cross(sd, np.array([0, 1, 0])))
+            sun_up = normalize_many(np.cross(sd, sun_right))
+            ray_angle = np.arctan2(dot(dirs[rays], sun_up), dot(dirs[rays], sun_right))
+            ray_factor = (np.sin(ray_angle * 3) ** 16) * (1.0 - corona_dist[rays])
+            sel = corona_dist[rows] < 0.8
+            corona_color[sel] += np.array([1.5, 1.2, 0.8]) * (ray_factor * 0.5)[:, None]
+
+        corona[rows] = corona_color * corona_intensity * 150.0
+    return corona
+
+
+def shade_background(origins, dirs, scene):
+    # a baked environment map replaces the per ray background math when the scene has one
+    if scene.environment is not None:
+        return scene.environment.sample(dirs)
+    dirs = normalize_many(dirs)
+    base_col = background_nebula(dirs, scene.background_texture) + background_corona(origins, dirs, scene.light)
+    return np.clip(base_col, 0.0, 255.0)
+
+
+def shade_ring(ring, origins, points, normals, u, v, current, scene, ambient):
+    tex_color = ring.material.texture.value_many(u, v)
+    light_dir = normalize_many(scene.light.center - points)
+    view_dir = normalize_many(origins - points)
+
+    # rim backlight and specular light
+    facing = dot(normals, view_dir)
+    rim = np.maximum(0.0, 1.0 - facing) ** 3 * 0.8
+    half_vec = normalize_many(light_dir + view_dir)
+    spec_angle = np.maximum(0.0, dot(normals, half_vec))
+    specular = spec_angle ** 64 * 0.5 * ring.material.specular_strength
+
+    shadow_strength = hard_shadow_many(points, scene, current, scene.light) ** 0.7
+
+    shaded_color = tex_color * (ambient + rim + specular)[:, None]
+    shaded_color = shaded_color * (shadow_strength * 1.2)[:, None]
+
+    # glow at edge
+    edge_glow = np.maximum(0.0, 1.0 - facing) ** 2 * 0.3
+    shaded_color += edge_glow[:, None] * np.array([1.0, 0.9, 0.8])
+    return np.clip(shaded_color, 0.0, 255.0)
+
+
+def shade_sun(sphere, u, v):
+    emission = sphere.material.emitted_many(u, v)
+    return np.clip(emission * np.array([1.7, 1.4, 1.1]), 0.0, 255.0)
+
+
+def shade_planet(sphere, dirs, points, normals, u, v, current, scene, ambient):
+    material = sphere.material
+    tex_color = vibrant(material.texture).value_many(u, v)
+
+    shadow_strength = hard_shadow_many(points, scene, current, scene.light)
+    in_shadow = shadow_strength < 0.1
+    view_dir = normalize_many(-dirs)
+    facing = dot(normals, view_dir)
+    shaded_color = np.empty_like(tex_color)
+
+    # in shadow: ambient and rim light only
+    rows = np.nonzero(in_shadow)[0]
+    if len(rows):
+        rim = 0.2 * np.maximum(0.0, facing[rows]) ** 4
+        ambient_color = ambient * np.array([0.6, 0.7, 1.1])
+        shaded_color[rows] = tex_color[rows] * (ambient_color + rim[:, None])
+
+    # lit: diffuse, specular and rim lighting for the backlight of the sun
+    rows = np.nonzero(~in_shadow)[0]
+    if len(rows):
+        n = normals[rows]
+        light_dir = normalize_many(scene.light.center - points[rows])
+        half_vec = normalize_many(light_dir + view_dir[rows])
+        diffuse = np.maximum(0.0, dot(n, light_dir)) ** 2.5
+        spec_angle = np.maximum(0.0, dot(n, half_vec))
+        specular = material.specular_strength * 3.0 * (spec_angle ** material.shininess)
+        specular = specular[:, None] * np.array([1.0, 0.9, 0.8])
+        rim = 0.15 * np.maximum(0.0, 1.0 - facing[rows]) ** 4
+        shaded = tex_color[rows] * (diffuse[:, None] + specular + rim[:, None]) * np.array([1.1, 1.0, 0.9])
+        shaded_color[rows] = shaded * shadow_strength[rows, None]
+
+    return np.clip(shaded_color, 0.0, 255.0)
+
+
+class WavefrontRenderer:
+    def __init__(self, scene, ambient, chunk_size=65536):
+        """
+        parameters:
+        - scene: the scene to trace
+        - ambient: ambient light term, same meaning as in ray_color
+        - chunk_size: number of rays traced together, bounds the memory of the buffers
+        """
+        self.scene = scene
+        self.ambient = ambient
+        self.chunk_size = chunk_size
+        # chunk buffers are allocated once and reused for every chunk
+        self._origins = np.empty((chunk_size, 3))
+        self._dirs = np.empty((chunk_size, 3))
+        self._colors = np.empty((chunk_size, 3))
+        self._hits = PacketHit.empty(chunk_size)
+
+    def shade(self, origins, dirs, out, candidates=None):
+        # color N rays, equivalent to calling ray_color for each of them
+        scene = self.scene
+        # the hits of a chunk go to the reused buffer, larger calls allocate their own
+        hits = scene.hit_many(origins, dirs, candidates, out=self._hits if len(dirs) <= self.chunk_size else None)
+        index = hits.index
+        n_spheres = len(scene.spheres)
+
+        rows = np.nonzero(index < 0)[0]
+        if len(rows):
+            out[rows] = shade_background(origins[rows], dirs[rows], scene)
+
+        # the shading only depends on the material, so hits on objects sharing one are shaded together
+        group = np.where(index >= 0, scene.shading_groups[index], -1)
+        for obj_index in np.unique(group[group >= 0]):
+            rows = np.nonzero(group == obj_index)[0]
+            obj = scene.objects[obj_index]
+            current = index[rows]
+            if obj_index >= n_spheres:
+                out[rows] = shade_ring(obj, origins[rows], hits.point[rows], hits.normal[rows],
+                                       hits.u[rows], hits.v[rows], current, scene, self.ambient)
+            elif obj.material.emissive:
+                out[rows] = shade_sun(obj, hits.u[rows], hits.v[rows])
+            else:
+                out[rows] = shade_planet(obj, dirs[rows], hits.point[rows], hits.normal[rows],
+                                         hits.u[rows], hits.v[rows], current, scene, self.ambient)
+        return out
+
+    def render(self, origins, dirs, candidates=None):
+        # origins and dirs are (H, W, S, 3) like CAMERA.get_rays, returns the (H, W, 3) averaged image
+        # candidates optionally lists the only objects the rays can hit
+        height, width, samples, _ = dirs.shape
+        if samples > self.chunk_size:
+            raise ValueError(f"chunk_size {self.chunk_size} is smaller than the {samples} samples of a pixel")
+        origins = np.broadcast_to(origins, dirs.shape).reshape(-1, samples, 3)
+        dirs = dirs.reshape(-1, samples, 3)
+        image = np.zeros((height * width, 3), dtype=np.float32)
+
+        # chunks hold whole pixels so every pixel is averaged inside one chunk
+        pixels_per_chunk = max(1, self.chunk_size // samples)
+        for start in range(0, height * width, pixels_per_chunk):
+            stop = min(start + pixels_per_chunk, height * width)
+            n = (stop - start) * samples
+            ro = self._origins[:n]
+            rd = self._dirs[:n]
+            ro[:] = origins[start:stop].reshape(-1, 3)
+            rd[:] = dirs[start:stop].reshape(-1, 3)
+            colors = self.shade(ro, rd, self._colors[:n], candidates).reshape(-1, samples, 3)
+
+            # accumulate the samples in the same order and precision as the scalar loop
+            color = np.zeros((stop - start, 3), dtype=np.float32)
+            for s in range(samples):
+                color += colors[:, s]
+            image[start:stop] = color / samples
+
+        return image.reshape(height, width, 3)
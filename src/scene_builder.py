@@ -1,4 +1,5 @@
 import numpy as np
+from ephemeris import Ephemeris
 from utils.json_parser import parse_json
 
 PLANET_DATA = [
@@ -15,31 +16,61 @@ PLANET_DATA = [
     ("Moon",    0.07,   "assets/texture/moon.png",                   0.5,       12.0,        1.0,             "Earth"),
 ]
 
+# optional Keplerian elements per body on top of the circular orbits of PLANET_DATA, see ephemeris.ELEMENT_DEFAULTS
+# e.g. {"Mars": {"eccentricity": 0.0934, "inclination": 0.032}}
+ORBIT_ELEMENTS = {}
+
+# positions of all bodies for the ray tracer and the OpenGL viewer
+EPHEMERIS = Ephemeris(PLANET_DATA, ORBIT_ELEMENTS)
+
 def get_camera_config():
     time, eye, target, up = parse_json()
     return time, eye, target, up
 
 def calculate_planet_position(planet, t, planets_dict=None):
-    name, radius, texture, orbit_radius, orbit_speed, rotation_speed = planet[:6]
-    parent = planet[6] if len(planet) == 7 else None
-
-    if parent:
-        parent_planet = planets_dict[parent]
-        parent_pos = calculate_planet_position(parent_planet, t, planets_dict)
-        angle = orbit_speed * t
-        pos = parent_pos + np.array([
-            orbit_radius * np.cos(angle),
-            0,
-            orbit_radius * np.sin(angle),
-        ])
-    else:
-        angle = orbit_speed * t
-        pos = np.array([
-            orbit_radius * np.cos(angle),
-            0,
-            orbit_radius * np.sin(angle),
-        ])
-    return pos
+    # position of one PLANET_DATA body at time t, planets_dict is no longer needed and kept for callers
+    return EPHEMERIS.position(planet[0], t).copy()
 
 def build_planet_dict():
-    return {p[0]: p for p in PLANET_DATA}
\ No newline at end of file
+    return {p[0]: p for p in PLANET_DATA}
+
+ASTEROID_TEXTURE = "assets/texture/rock.png"
+
+class AsteroidBelt:
+    """
+    Procedural belt of small bodies between Mars and Jupiter.
+
+    Every asteroid has its own orbit radius, phase, height above the ecliptic and size,
+    drawn once from a seeded generator, so the belt is the same in every frame.
+
+    Args:
+        count: number of asteroids
+        inner_radius, outer_radius: range of the orbit radii
+        min_size, max_size: range of the asteroid radii
+        thickness: maximum height above or below the ecliptic
+        seed: seed of the random generator
+    """
+    def __init__(self, count, inner_radius=6.0, outer_radius=7.0, min_size=0.01, max_size=0.03,
+                 thickness=0.15, seed=0):
+        rng = np.random.default_rng(seed)
+        self.count = count
+        self.orbit_radius = rng.uniform(inner_radius, outer_radius, count)
+        # orbit speeds follow Kepler's third law relative to the orbit of Earth
+        self.orbit_speed = (4.0 / self.orbit_radius) ** 1.5
+        self.phase = rng.uniform(0.0, 2 * np.pi, count)
+        self.height = rng.uniform(-thickness, thickness, count)
+        self.radius = rng.uniform(min_size, max_size, count)
+
+    def positions(self, t):
+        """
+        Positions of all asteroids at time t.
+
+        Returns:
+            (count, 3) array of centers
+        """
+        angle = self.orbit_speed * t + self.phase
+        return np.stack([
+            self.orbit_radius * np.cos(angle),
+            self.height,
+            self.orbit_radius * np.sin(angle),
+        ], axis=-1)
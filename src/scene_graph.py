@@ -0,0 +1,159 @@
+import numpy as np
+
+from ray_tracing.material import Material
+from ray_tracing.scene import Scene
+from ray_tracing.sphere import Ring, Sphere
+from ray_tracing.texture_cache import texture_cache
+from scene_builder import ASTEROID_TEXTURE, EPHEMERIS, PLANET_DATA, AsteroidBelt
+
+RING_TEXTURE = "assets/texture/planets/saturn/saturn ring.png"
+SKY_TEXTURE = "assets/texture/space.png"
+
+
+class SceneNode:
+    """
+    Node of the scene graph, an offset from its parent and the scene objects placed at it.
+
+    The world position is cached and only recomputed after the node or one of its
+    ancestors moved, which marks the node and its whole subtree dirty.
+
+    Args:
+        name: name of the body
+        parent: parent node, None for a node placed relative to the origin
+        objects: object indices in the scene of the spheres and rings centered on the node
+    """
+    def __init__(self, name, parent=None, objects=()):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.objects = list(objects)
+        self.local = np.zeros(3)
+        self._world = np.zeros(3)
+        self.dirty = True
+        if parent is not None:
+            parent.children.append(self)
+
+    def set_local(self, offset):
+        """Move the node relative to its parent, returns whether it actually moved."""
+        if not self.dirty and np.array_equal(offset, self.local):
+            return False
+        self.local = np.array(offset, dtype=np.float64)
+        self.mark_dirty()
+        return True
+
+    def mark_dirty(self):
+        # a dirty node always has a dirty subtree, so the walk stops at nodes that already are
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node.dirty = True
+            stack.extend(child for child in node.children if not child.dirty)
+
+    @property
+    def world(self):
+        """World position, recomputed from the parent chain only when the node is dirty."""
+        if self.dirty:
+            # same operand order as Ephemeris.positions, so both give the same bits
+            self._world = self.local + self.parent.world if self.parent is not None else self.local.copy()
+            self.dirty = False
+        return self._world
+
+
+class SceneGraph:
+    """
+    Persistent solar system scene, built once and moved to a new time by update.
+
+    Materials, textures, spheres, rings and the Scene with its packed arrays are created
+    once. update only touches the nodes whose orbit offset changed, their subtrees and
+    the scene objects on them, so the per frame cost follows what actually moved. The
+    parent of a body can be any other body (moons of moons), see ephemeris.Ephemeris.
+
+    Args:
+        asteroids: number of bodies in the asteroid belt
+        data: PLANET_DATA style body list, the ephemeris must be built from the same list
+        ephemeris: positions of the bodies over time
+    """
+    def __init__(self, asteroids=0, data=PLANET_DATA, ephemeris=EPHEMERIS):
+        self.data = data
+        self.ephemeris = ephemeris
+        spheres = []
+        rings = []
+        body_rings = {}
+
+        for i, pdata in enumerate(data):
+            name, radius, texture_path = pdata[0], pdata[1], pdata[2]
+            # textures come from the process wide cache and are only decoded once a ray hits the body
+            tex = texture_cache.lazy(texture_path)
+            if name == "Sun":
+                mat = Material(tex, emissive=True, specular_strength=0.0, shininess=0, halo=True, halo_size=8.0,
+                               halo_strength=1.5)
+            else:
+                mat = Material(tex, emissive=False, specular_strength=0.4, shininess=64)
+            spheres.append(Sphere(np.zeros(3), radius, mat))
+            if name == "Saturn":
+                ring_mat = Material(texture_cache.lazy(RING_TEXTURE), emissive=False, specular_strength=0.2,
+                                    shininess=32)
+                body_rings[i] = len(rings)
+                rings.append(Ring(center=np.zeros(3), inner_radius=radius * 1.5, outer_radius=radius * 2.5,
+                                  material=ring_mat))
+
+        # asteroids share one material so the wavefront backend shades them together
+        self.belt = AsteroidBelt(asteroids) if asteroids else None
+        self.belt_objects = np.arange(len(data), len(data) + asteroids, dtype=np.intp)
+        if asteroids:
+            rock = Material(texture_cache.lazy(ASTEROID_TEXTURE), emissive=False, specular_strength=0.1, shininess=16)
+            spheres.extend(Sphere(np.zeros(3), radius, rock) for radius in self.belt.radius)
+
+        # one node per body, parents first, a ring sits on the node of its planet
+        # object indices follow the scene: the spheres first and then the rings
+        self.nodes = [None] * len(data)
+        for i in ephemeris.order:
+            parent = self.nodes[ephemeris.parent[i]] if ephemeris.parent[i] >= 0 else None
+            objects = [i] + ([len(spheres) + body_rings[i]] if i in body_rings else [])
+            self.nodes[i] = SceneNode(data[i][0], parent, objects)
+
+        self.spheres = spheres
+        self.rings = rings
+        self.scene = None
+        self.time = None
+
+    def update(self, time):
+        """
+        Move every body to its position at time.
+
+        Returns:
+            the persistent Scene, updated in place, a later update moves it again
+        """
+        # the textures are resolved through the cache again every frame, the graph only keeps handles
+        texture_cache.release()
+        if self.scene is not None and time == self.time:
+            return self.scene
+        local = self.ephemeris.local_at(time)
+        for node, offset in zip(self.nodes, local):
+            node.set_local(offset)
+
+        # a moved node drags its subtree along, every dirty node gets its new world position
+        objects = self.spheres + self.rings
+        moved = []
+        for i in self.ephemeris.order:
+            node = self.nodes[i]
+            if node.dirty:
+                center = node.world
+                for k in node.objects:
+                    objects[k].center[:] = center
+                moved.extend(node.objects)
+
+        if self.belt is not None:
+            for sphere, pos in zip(self.spheres[len(self.data):], self.belt.positions(time)):
+                sphere.center[:] = pos
+            moved.extend(self.belt_objects.tolist())
+
+        if self.scene is None:
+            # first placement, the packed arrays and the BVH are built on the real positions
+            light_sphere = next(s for s in self.spheres if s.material.emissive)
+            self.scene = Scene(self.spheres, light_sphere, rings=self.rings,
+                               background_texture=texture_cache.lazy(SKY_TEXTURE))
+        else:
+            self.scene.move(moved)
+        self.time = time
+        return self.scene
@@ -2,18 +2,23 @@ import numpy as np
 from OpenGL.GL import *
 
 class Orbit:
-    def __init__(self, radius, segments=100):
+    def __init__(self, radius, segments=100, path=None):
+        # path optionally gives the (N, 3) points of a non circular orbit, e.g. Ephemeris.orbit_path
         self.radius = radius
-        self.segments = segments
+        self.path = path
+        self.segments = segments if path is None else len(path)
         self.vao = glGenVertexArrays(1)
         self.vbo = glGenBuffers(1)
         self._prepare_circle()
 
     def _prepare_circle(self):
-        theta = np.linspace(0, 2 * np.pi, self.segments, endpoint=True)
-        x = self.radius * np.cos(theta)
-        z = self.radius * np.sin(theta)
-        y = np.zeros_like(x)
+        if self.path is not None:
+            x, y, z = np.asarray(self.path, dtype=np.float64).T
+        else:
+            theta = np.linspace(0, 2 * np.pi, self.segments, endpoint=True)
+            x = self.radius * np.cos(theta)
+            z = self.radius * np.sin(theta)
+            y = np.zeros_like(x)
         texcoords = np.zeros((self.segments, 2), dtype=np.float32)
         vertices = np.column_stack([x, y, z, texcoords]).astype(np.float32)
 
@@ -1,15 +1,17 @@
 from objects.planet import Planet
 from transformation.orbit import Orbit
-import numpy as np
 import pyrr
 from OpenGL.GL import *
 from effects.saturn_ring import SaturnRing
+from scene_builder import EPHEMERIS
 
 class Transform:
-    def __init__(self, data, sectors, stacks):
+    def __init__(self, data, sectors, stacks, ephemeris=EPHEMERIS):
         self.sectors = sectors
         self.stacks = stacks
         self.planets_data = data
+        # the ephemeris of the ray tracer, built from the same body list, all bodies are placed with one call per frame
+        self.ephemeris = ephemeris
         self.planets = []
         self.orbits = []
         self._init_planets()
@@ -44,40 +46,13 @@ class Transform:
 
             # Add orbit for planets that orbit the sun (not the sun itself or moons)
             if orbit_radius > 0 and parent is None:
-                self.orbits.append(Orbit(orbit_radius))
+                self.orbits.append(Orbit(orbit_radius, path=self.ephemeris.orbit_path(name)))
 
     def place_planets(self, time_elapsed, model_loc, use_solid_color_loc, solid_color_loc, shader):
         glUseProgram(shader)
-        for planet in self.planets:
-            if planet.parent == "Earth":
-                # Moon orbits Earth
-                earth = next(p for p in self.planets if p.name == "Earth")
-                earth_angle = earth.orbit_speed * time_elapsed
-                earth_pos = np.array(
-                    [
-                        earth.orbit_radius * np.cos(earth_angle),
-                        0,
-                        earth.orbit_radius * np.sin(earth_angle),
-                    ]
-                )
-                moon_angle = planet.orbit_speed * time_elapsed
-                moon_pos = earth_pos + np.array(
-                    [
-                        planet.orbit_radius * np.cos(moon_angle),
-                        0,
-                        planet.orbit_radius * np.sin(moon_angle),
-                    ]
-                )
-                pos = moon_pos
-            else:
-                angle = planet.orbit_speed * time_elapsed
-                pos = np.array(
-                    [
-                        planet.orbit_radius * np.cos(angle),
-                        0,
-                        planet.orbit_radius * np.sin(angle),
-                    ]
-                )
+        # positions of every body, moons already include their parent
+        positions = self.ephemeris.at(time_elapsed)
+        for planet, pos in zip(self.planets, positions):
             model_matrix = pyrr.matrix44.create_from_translation(pos)
             planet.draw(model_loc, model_matrix, time_elapsed, planet.rotation_speed)
 
@@ -1,17 +1,106 @@
 import imageio
 import os
+import queue
+import threading
+
+import numpy as np
+from PIL import Image
+
+
+class VideoSink:
+    """
+    Streaming video encoder that takes rendered frames as in-memory arrays.
+
+    Frames are encoded on a background thread as soon as they are appended, so
+    encoding overlaps with rendering and frames never round-trip through PNG files.
+
+    Attributes:
+        output_path (str): Path of the encoded video.
+        frames_dir (str): Optional directory where every frame is also saved as PNG.
+        frame_count (int): Number of frames appended so far.
+    """
+
+    def __init__(self, output_path, fps=5, codec="libx264", quality=None, frames_dir=None, queue_size=8, **writer_kwargs):
+        """
+        Open the video writer and start the encoding thread.
+
+        Args:
+            output_path (str): Path of the video file to write.
+            fps (int): Frames per second of the video (default: 5).
+            codec (str): FFMPEG codec name (default: "libx264").
+            quality (float): Optional FFMPEG quality from 0 to 10, None keeps the codec default.
+            frames_dir (str): When set, every frame is also written there as frame_XXXX.png.
+            queue_size (int): Frames waiting for the encoder before append blocks (default: 8).
+            **writer_kwargs: Extra options passed to imageio's FFMPEG writer.
+        """
+        self.output_path = output_path
+        self.frames_dir = frames_dir
+        self.frame_count = 0
+        if frames_dir:
+            os.makedirs(frames_dir, exist_ok=True)
+
+        self._writer = imageio.get_writer(output_path, fps=fps, format="FFMPEG", codec=codec, quality=quality, **writer_kwargs)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def _encode(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            index, frame = item
+            if self._error is not None:
+                continue
+            try:
+                self._writer.append_data(frame)
+                if self.frames_dir:
+                    Image.fromarray(frame).save(os.path.join(self.frames_dir, f"frame_{index:04d}.png"))
+            except Exception as e:
+                self._error = e
+
+    def append(self, frame):
+        """
+        Queue one frame for encoding.
+
+        Args:
+            frame (np.ndarray): (H, W, 3) uint8 frame. It is copied, so the caller may reuse the buffer.
+
+        Raises:
+            Exception: Any error raised earlier by the encoding thread.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put((self.frame_count, np.array(frame, dtype=np.uint8)))
+        self.frame_count += 1
+
+    def close(self):
+        """
+        Wait for the queued frames to be encoded and finalize the video file.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._writer.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 
 def generate_video_from_frames(input_dir, output_path, fps=5):
     images = sorted([img for img in os.listdir(input_dir) if img.endswith(".png")])
     if not images:
         raise ValueError("No frames found.")
 
-    writer = imageio.get_writer(output_path, fps=fps, format='FFMPEG') 
-
-    for filename in images:
-        image_path = os.path.join(input_dir, filename)
-        frame = imageio.imread(image_path)
-        writer.append_data(frame)
+    with VideoSink(output_path, fps=fps) as sink:
+        for filename in images:
+            image_path = os.path.join(input_dir, filename)
+            sink.append(imageio.imread(image_path))
 
-    writer.close()
     print(f"Video saved to {output_path}")
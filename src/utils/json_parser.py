@@ -1,14 +1,101 @@
 import json
+import os
+import numpy as np
 from pyrr import Vector3
 
+CONFIG_PATH = os.path.join("input", "scene_config.json")
 
-def parse_json(path="input\scene_config.json"):
+
+def parse_camera(camera):
+    """Camera vectors of a {"position", "look_at", "up"} object of a json file.
+
+    Args:
+        camera (dict): Parsed camera object, "up" defaults to +y.
+
+    Returns:
+        tuple: (eye, target, up) as Vector3.
+    """
+    return (Vector3(camera["position"]), Vector3(camera["look_at"]),
+            Vector3(camera.get("up", [0.0, 1.0, 0.0])))
+
+
+def parse_json(path=CONFIG_PATH):
     with open(path, "r") as file:
         data = json.load(file)
 
     time = data["time"]
-    camera_eye = Vector3(data["camera"]["position"])
-    camera_target = Vector3(data["camera"]["look_at"])
-    camera_up = Vector3(data["camera"]["up"])
+    camera_eye, camera_target, camera_up = parse_camera(data["camera"])
 
     return time, camera_eye, camera_target, camera_up
+
+
+def _job_times(job):
+    # explicit "time" or a "times" range {"start", "step" and "stop" (inclusive) or "count"}
+    if "time" in job:
+        return [float(job["time"])]
+    times = job["times"]
+    start, step = float(times["start"]), float(times.get("step", 1.0))
+    if "count" in times:
+        count = int(times["count"])
+    else:
+        if step <= 0:
+            raise ValueError(f"time range step must be positive, got {step}")
+        count = int(np.floor((float(times["stop"]) - start) / step + 1e-9)) + 1
+    # i * step like the frames of a video, so range jobs land on the same times as render_video
+    return [start + i * step for i in range(max(count, 0))]
+
+
+def parse_jobs(path):
+    """Render jobs of a batch job file.
+
+    The file holds named cameras and a list of jobs, every job renders one or
+    more cameras at one time or at a range of times::
+
+        {
+          "cameras": {"main": {"position": [0, 1.5, 3], "look_at": [0, 0, 0]}},
+          "jobs": [
+            {"time": 86400, "cameras": ["main"]},
+            {"times": {"start": 0, "stop": 5, "step": 0.1}, "camera": "main"},
+            {"time": 10, "camera": {"position": [12, 3, 0], "look_at": [0, 0, 0]}, "output": "top.png"}
+          ]
+        }
+
+    Args:
+        path (str): Path of the job file.
+
+    Returns:
+        tuple:
+            - jobs (list): One dict per rendered image with "index", "time", "camera"
+              (name), "eye", "target", "up" and "output" (None for the default name).
+            - options (dict): Every other top level entry of the file (settings, seed, ...).
+
+    Raises:
+        ValueError: If a job has no time or names an unknown camera.
+    """
+    with open(path, "r") as file:
+        data = json.load(file)
+
+    cameras = {name: parse_camera(camera) for name, camera in data.get("cameras", {}).items()}
+    jobs = []
+    for k, job in enumerate(data["jobs"]):
+        if "time" not in job and "times" not in job:
+            raise ValueError(f"job {k} has neither a time nor a times range")
+        refs = job.get("cameras", [job["camera"]] if "camera" in job else list(cameras))
+        if not refs:
+            raise ValueError(f"job {k} has no camera")
+        times = _job_times(job)
+        for ref in refs:
+            if isinstance(ref, dict):
+                name, camera = f"job{k}", parse_camera(ref)
+            elif ref in cameras:
+                name, camera = ref, cameras[ref]
+            else:
+                raise ValueError(f"job {k} uses the unknown camera {ref!r}")
+            for time in times:
+                # an explicit output file only makes sense for a single image
+                output = job.get("output") if len(times) == 1 and len(refs) == 1 else None
+                jobs.append({"index": len(jobs), "time": time, "camera": name, "eye": camera[0],
+                             "target": camera[1], "up": camera[2], "output": output})
+
+    options = {key: value for key, value in data.items() if key not in ("cameras", "jobs")}
+    return jobs, options
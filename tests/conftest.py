@@ -0,0 +1,91 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# the modules import each other from src, the same way the scripts run from the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from camera.camera import CAMERA
+from ray_tracing.material import Material
+from ray_tracing.render import RenderSettings
+from ray_tracing.scene import Scene
+from ray_tracing.sphere import Ring, Sphere
+from ray_tracing.texture import ImageTexture
+
+WIDTH, HEIGHT, SAMPLES = 48, 24, 2
+
+
+def noise_texture(seed, height=16, width=32, brightness=255):
+    rng = np.random.default_rng(seed)
+    return ImageTexture.from_array((rng.random((height, width, 3)) * brightness).astype(np.uint8))
+
+
+class SyntheticSystem:
+    """
+    Small solar system built from in-memory textures: a sun with a halo, planets on circular
+    orbits, a ring around the first planet, a moon half in the shadow of the second planet and
+    optionally a belt of spheres sharing one material.
+
+    move(t) places the planets at time t in place, like scene_graph.SceneGraph.update.
+    """
+    def __init__(self, planets=4, asteroids=0):
+        sun = Sphere(np.zeros(3), 1.0, Material(noise_texture(0), emissive=True, specular_strength=0.0,
+                                                 shininess=0, halo=True, halo_size=8.0, halo_strength=1.5))
+        spheres = [sun]
+        for k in range(planets):
+            material = Material(noise_texture(k + 1), specular_strength=0.4, shininess=64)
+            spheres.append(Sphere(np.zeros(3), 0.4 + 0.1 * k, material))
+        self.radii = 1.8 + 0.9 * np.arange(planets)
+        self.speeds = 1.0 / (1.0 + np.arange(planets))
+        self.phases = 1.3 * np.arange(planets)
+        self.moon = Sphere(np.zeros(3), 0.2, Material(noise_texture(40), specular_strength=0.3, shininess=32))
+        spheres.append(self.moon)
+
+        if asteroids:
+            rng = np.random.default_rng(1)
+            angle = rng.uniform(0.0, 2 * np.pi, asteroids)
+            distance = rng.uniform(2.3, 3.3, asteroids)
+            height = rng.uniform(-0.1, 0.1, asteroids)
+            rock = Material(noise_texture(99), specular_strength=0.1, shininess=16)
+            spheres.extend(Sphere(np.array([d * np.cos(a), h, d * np.sin(a)]), r, rock)
+                           for a, d, h, r in zip(angle, distance, height, rng.uniform(0.05, 0.12, asteroids)))
+
+        ring = Ring(center=np.zeros(3), inner_radius=0.6, outer_radius=1.0,
+                    material=Material(noise_texture(50), specular_strength=0.2, shininess=32))
+        self.planets = spheres[1:planets + 1]
+        self.ring = ring
+        self.scene = Scene(spheres, sun, rings=[ring], background_texture=noise_texture(100, brightness=8))
+        self.move(0.0)
+
+    def move(self, t):
+        for planet, radius, angle in zip(self.planets, self.radii, self.speeds * t + self.phases):
+            planet.center[:] = [radius * np.cos(angle), 0.0, radius * np.sin(angle)]
+        self.ring.center[:] = self.planets[0].center
+        # behind the planet as seen from the sun and a bit above, so only its lower half is shadowed
+        center = self.planets[1].center
+        self.moon.center[:] = center + 0.9 * center / np.linalg.norm(center) + [0.0, 0.3, 0.0]
+        self.scene.move(list(range(1, len(self.planets) + 2)) + [len(self.scene.spheres)])
+        return self.scene
+
+
+@pytest.fixture
+def camera():
+    return CAMERA(None, camera_eye=(0.0, 2.0, 5.0), camera_target=(0.0, 0.0, 0.0), camera_up=(0.0, 1.0, 0.0),
+                  width=WIDTH, height=HEIGHT)
+
+
+@pytest.fixture
+def jitter():
+    return np.random.default_rng(0).random((HEIGHT, WIDTH, SAMPLES, 2))
+
+
+@pytest.fixture
+def settings():
+    return RenderSettings(ambient=0.01, max_depth=3, backend="wavefront", chunk_size=4096)
+
+
+@pytest.fixture
+def solar_system():
+    return SyntheticSystem
@@ -0,0 +1,14 @@
+import numpy as np
+
+from ray_tracing.binning import bin_objects
+from ray_tracing.parallel import render_tiles
+from ray_tracing.render import RenderSettings
+
+
+def test_binned_tiles_match_unbinned(solar_system, camera, jitter):
+    scene = solar_system().move(1.0)
+    bins = bin_objects(scene, camera, 8)
+    for backend in ("scalar", "wavefront"):
+        settings = RenderSettings(backend=backend)
+        binned = render_tiles(scene, camera, jitter, settings, tile_size=8, bins=bins)
+        assert np.array_equal(binned, render_tiles(scene, camera, jitter, settings, tile_size=8))
@@ -0,0 +1,24 @@
+import numpy as np
+
+from ray_tracing import scene as scene_module
+from ray_tracing.render import RenderSettings, render_rays
+
+
+def render_both(scene, camera, jitter):
+    origins, directions = camera.get_rays(jitter)
+    return [render_rays(scene, origins, directions, RenderSettings(backend=backend))
+            for backend in ("scalar", "wavefront")]
+
+
+def test_bvh_matches_the_linear_scan(solar_system, camera, jitter, monkeypatch):
+    system = solar_system(asteroids=80)
+    # moving the planets refits the tree built at t = 0
+    scene = system.move(3.0)
+    assert scene.bvh is not None
+    traversed = render_both(scene, camera, jitter)
+
+    monkeypatch.setattr(scene_module, "BVH_MIN_OBJECTS", len(scene.objects) + 1)
+    scene.pack()
+    assert scene.bvh is None
+    for image, reference in zip(traversed, render_both(scene, camera, jitter)):
+        assert np.array_equal(image, reference)
@@ -0,0 +1,47 @@
+import numpy as np
+
+from ephemeris import Ephemeris, solve_kepler
+from scene_builder import PLANET_DATA
+
+
+def eccentric_elements():
+    orbiting = [body[0] for body in PLANET_DATA if body[3] > 0]
+    return {name: {"eccentricity": 0.1 + 0.1 * k, "mean_anomaly": 0.3 * k, "periapsis": 0.2 * k}
+            for k, name in enumerate(orbiting)}
+
+
+def test_solve_kepler_converges_on_a_times_by_bodies_grid():
+    rng = np.random.default_rng(0)
+    m = rng.uniform(-50.0, 50.0, (200, 9))
+    e = rng.uniform(0.0, 0.95, 9)
+    E = solve_kepler(m, e)
+    assert E.shape == m.shape
+    assert np.max(np.abs(E - e * np.sin(E) - m)) < 1e-10
+
+
+def test_eccentric_grid_matches_single_times():
+    times = np.linspace(0.0, 1000.0, 64)
+    grid = Ephemeris(PLANET_DATA, eccentric_elements()).positions(times)
+    single = np.stack([Ephemeris(PLANET_DATA, eccentric_elements()).positions([t])[0] for t in times])
+    np.testing.assert_allclose(grid, single, rtol=0, atol=1e-12)
+
+
+def test_circular_orbits_keep_the_closed_form():
+    ephemeris = Ephemeris(PLANET_DATA)
+    earth = ephemeris.index["Earth"]
+    _, _, _, radius, speed, _ = PLANET_DATA[earth][:6]
+    t = 86400.0
+    expected = [radius * np.cos(speed * t), 0.0, radius * np.sin(speed * t)]
+    assert np.array_equal(ephemeris.at(t)[earth], expected)
+
+
+def test_times_outside_the_cached_grids_do_not_evict_them():
+    ephemeris = Ephemeris(PLANET_DATA, eccentric_elements())
+    times = np.linspace(0.0, 10.0, 11)
+    grid = ephemeris.positions(times)
+    for t in np.linspace(0.05, 9.95, 100):
+        uncached = ephemeris.at(t)
+    assert len(ephemeris._cache) == 1
+    assert ephemeris.positions(times) is grid
+    assert np.array_equal(uncached, Ephemeris(PLANET_DATA, eccentric_elements()).positions([9.95])[0])
+    assert np.array_equal(ephemeris.at(times[3]), grid[3])
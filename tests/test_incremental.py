@@ -0,0 +1,10 @@
+from ray_tracing.incremental import verify_incremental
+
+
+def test_incremental_frames_match_full_renders(solar_system, camera, jitter, settings):
+    system = solar_system()
+    # the scene is moved in place between frames, like the persistent scene graph does
+    rendered = verify_incremental((system.move(0.05 * i) for i in range(4)), camera, jitter, settings, tile_size=8)
+    tiles = len(range(0, camera.height, 8)) * len(range(0, camera.width, 8))
+    assert rendered[0] == tiles
+    assert all(0 < count < tiles for count in rendered[1:])
@@ -0,0 +1,14 @@
+from ray_tracing.jit import verify_jit
+
+
+def test_kernels_match_ray_color(solar_system, camera, jitter, settings):
+    # kernels=True runs the kernels interpreted when numba is not installed, so their logic is checked either way
+    system = solar_system()
+    for t in (0.0, 2.0):
+        verify_jit(system.move(t), camera, jitter, settings, kernels=True)
+
+
+def test_kernels_match_ray_color_with_a_bvh(solar_system, camera, jitter, settings):
+    system = solar_system(asteroids=80)
+    assert system.scene.bvh is not None
+    verify_jit(system.scene, camera, jitter, settings, kernels=True)
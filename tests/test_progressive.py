@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from ray_tracing.progressive import render_progressive
+
+
+class Interrupted(Exception):
+    pass
+
+
+def stop_after(checkpoints):
+    # preview callback that aborts the render once it saw that many checkpoints
+    seen = []
+
+    def preview(acc):
+        seen.append(acc)
+        if len(seen) == checkpoints:
+            raise Interrupted
+    return preview
+
+
+def test_resumed_render_matches_an_uninterrupted_one(solar_system, camera, settings, tmp_path):
+    scene = solar_system().move(1.0)
+    render = dict(passes=3, samples_per_pass=2, seed=5, tile_size=16, meta={"time": 1.0})
+    full = render_progressive(scene, camera, settings, checkpoint_path=str(tmp_path / "full.npz"), **render)
+
+    path = str(tmp_path / "resumed.npz")
+    # a checkpoint after every one of the 6 tiles, the render stops in the middle of the second pass
+    with pytest.raises(Interrupted):
+        render_progressive(scene, camera, settings, checkpoint_path=path, checkpoint_interval=0.0,
+                           preview=stop_after(8), **render)
+    resumed = render_progressive(scene, camera, settings, checkpoint_path=path, **render)
+
+    assert np.array_equal(resumed.count, full.count)
+    assert np.array_equal(resumed.sum, full.sum)
+    assert np.array_equal(resumed.sum_sq, full.sum_sq)
+    assert np.all(full.count == 6)
+
+
+def test_resume_refuses_a_checkpoint_of_another_render(solar_system, camera, settings, tmp_path):
+    scene = solar_system().move(1.0)
+    path = str(tmp_path / "frame.npz")
+    render_progressive(scene, camera, settings, 1, path, meta={"time": 1.0})
+    with pytest.raises(ValueError):
+        render_progressive(scene, camera, settings, 2, path, meta={"time": 2.0})
@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ray_tracing.texture import ImageTexture
+from ray_tracing.texture_store import TextureStore
+
+
+@pytest.fixture
+def baked(tmp_path):
+    path = str(tmp_path / "planet.png")
+    Image.fromarray((np.random.default_rng(0).random((8, 16, 3)) * 255).astype(np.uint8)).save(path)
+    store = TextureStore(str(tmp_path / "store"))
+    store.bake(path)
+    return store, path
+
+
+def baked_file(store, path, name):
+    return f"{store._entry(path)}.{name}.npy"
+
+
+def test_open_maps_the_baked_texture(baked):
+    store, path = baked
+    texture = store.open(path)
+    assert np.array_equal(texture.image, ImageTexture(path).image)
+    assert set(texture._variants) == set(store.variants)
+
+
+@pytest.mark.parametrize("name", ["base", "vibrant"])
+@pytest.mark.parametrize("damage", ["remove", "truncate", "empty"])
+def test_a_damaged_file_makes_the_entry_stale(baked, name, damage):
+    store, path = baked
+    file = baked_file(store, path, name)
+    if damage == "remove":
+        os.remove(file)
+    else:
+        size = os.path.getsize(file)
+        with open(file, "r+b") as f:
+            f.truncate(size // 2 if damage == "truncate" else 0)
+
+    assert not store.is_fresh(path)
+    assert store.open(path) is None
+    # the loader decodes the image instead and baking again repairs the entry
+    assert np.array_equal(store.load(path).image, ImageTexture(path).image)
+    assert store.bake_all(os.path.dirname(path)) == {path: "baked"}
+    assert store.open(path) is not None
+
+
+def test_an_unreadable_file_of_the_right_size_is_not_mapped(baked):
+    store, path = baked
+    with open(baked_file(store, path, "base"), "r+b") as f:
+        f.write(b"\0" * 16)
+    assert store.open(path) is None
+    assert np.array_equal(store.load(path).image, ImageTexture(path).image)